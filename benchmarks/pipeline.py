@@ -0,0 +1,284 @@
+"""Benchmark do pipeline de download contra um servidor local que imita o YouTube.
+
+Gera áudios, vídeos, thumbnails e info dicts sintéticos, serve tudo por HTTP
+em 127.0.0.1 e conduz o GerenciadorDownload pela fila: extração, download,
+pós-processamento, tags e histórico. O resultado (tempo por fase, tarefas por
+minuto, pico de memória) é gravado em JSON para comparar versões:
+
+    python benchmarks/pipeline.py --jobs 20 --output atual.json
+    python benchmarks/pipeline.py --jobs 20 --baseline atual.json
+
+A extração do YouTube é simulada: o info dict de cada vídeo é baixado do
+servidor local e gravado no cache de informações, de onde o downloader o lê.
+Tudo roda em uma pasta temporária, sem tocar no config.json, no histórico ou
+no cache reais. Com --ffmpeg (e o FFmpeg instalado) as mídias são codificadas
+de verdade e os downloads passam por conversão para MP3 e junção de vídeo.
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fases do TarefaDownload.tempos agrupadas nas etapas do relatório
+ETAPAS = {
+    "extract": ("extracao",),
+    "download": ("espera_download", "download"),
+    "postprocess": ("fila_pos_processamento", "pos_processamento"),
+    "tag": ("thumbnail", "metadados"),
+    "history": ("historico",),
+}
+
+# Frame MPEG-1 Layer III, 128 kbps, 44,1 kHz (417 bytes)
+FRAME_MP3 = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+class ManipuladorSilencioso(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def copyfile(self, origem, destino):
+        try:
+            super().copyfile(origem, destino)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # O yt-dlp pode fechar a conexão ao sondar o arquivo
+
+def iniciar_servidor(diretorio):
+    servidor = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(ManipuladorSilencioso, directory=diretorio)
+    )
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def gerar_midias(diretorio, tamanho_mb, usar_ffmpeg):
+    """Cria as mídias servidas. Retorna a descrição dos formatos oferecidos."""
+    os.makedirs(diretorio, exist_ok=True)
+    from PIL import Image
+    Image.new("RGB", (1280, 720), (200, 40, 40)).save(os.path.join(diretorio, "thumb.jpg"), quality=90)
+
+    if usar_ffmpeg:
+        duracao = str(max(5, int(tamanho_mb * 8 * 1024 / 160)))  # ~160 kbps de áudio
+        ffmpeg = ["ffmpeg", "-y", "-loglevel", "error"]
+        subprocess.run(ffmpeg + ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duracao}",
+                                 "-c:a", "libopus", "-b:a", "160k", os.path.join(diretorio, "audio.webm")], check=True)
+        subprocess.run(ffmpeg + ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duracao}",
+                                 "-c:a", "aac", "-b:a", "128k", os.path.join(diretorio, "audio.m4a")], check=True)
+        subprocess.run(ffmpeg + ["-f", "lavfi", "-i", f"testsrc=size=1280x720:rate=30:duration={duracao}",
+                                 "-c:v", "libx264", "-preset", "ultrafast", "-an",
+                                 os.path.join(diretorio, "video.mp4")], check=True)
+        return [
+            {"format_id": "251", "arquivo": "audio.webm", "ext": "webm", "acodec": "opus", "vcodec": "none", "abr": 160},
+            {"format_id": "140", "arquivo": "audio.m4a", "ext": "m4a", "acodec": "mp4a.40.2", "vcodec": "none", "abr": 128},
+            {"format_id": "136", "arquivo": "video.mp4", "ext": "mp4", "acodec": "none", "vcodec": "avc1.64001f", "height": 720},
+        ]
+
+    # Sem FFmpeg: um MP3 válido e um MP4 combinado, que o planejador copia direto
+    frames = max(1, int(tamanho_mb * 1024 * 1024 / len(FRAME_MP3)))
+    with open(os.path.join(diretorio, "audio.mp3"), "wb") as f:
+        f.write(FRAME_MP3 * frames)
+    with open(os.path.join(diretorio, "video.mp4"), "wb") as f:
+        f.write(os.urandom(int(tamanho_mb * 1024 * 1024)))
+    return [
+        {"format_id": "mp3", "arquivo": "audio.mp3", "ext": "mp3", "acodec": "mp3", "vcodec": "none", "abr": 128},
+        {"format_id": "22", "arquivo": "video.mp4", "ext": "mp4", "acodec": "mp4a.40.2", "vcodec": "avc1.64001f", "height": 720},
+    ]
+
+def gerar_infos(diretorio, base_url, formatos, quantidade):
+    """Grava um info dict por vídeo, no formato devolvido pelo extrator do YouTube."""
+    os.makedirs(diretorio, exist_ok=True)
+    ids = []
+    for n in range(quantidade):
+        id_video = f"bench{n:06d}"  # 11 caracteres, como os IDs do YouTube
+        info = {
+            "id": id_video,
+            "title": f"Artista {n % 7} - Faixa de teste {n}",
+            "webpage_url": f"https://www.youtube.com/watch?v={id_video}",
+            "extractor": "youtube",
+            "extractor_key": "Youtube",
+            "upload_date": "20240131",
+            "duration": 180,
+            "thumbnail": f"{base_url}/media/thumb.jpg",
+            "thumbnails": [{"url": f"{base_url}/media/thumb.jpg", "width": 1280, "height": 720}],
+            "formats": [
+                {**{k: v for k, v in f.items() if k != "arquivo"},
+                 "url": f"{base_url}/media/{f['arquivo']}?v={id_video}", "protocol": "http"}
+                for f in formatos
+            ],
+        }
+        with open(os.path.join(diretorio, f"{id_video}.json"), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        ids.append(id_video)
+    return ids
+
+def pico_rss_mb():
+    """Pico de memória do processo e dos filhos (FFmpeg), em MiB."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    escala = 1024 * 1024 if sys.platform == "darwin" else 1024  # bytes no macOS, KiB no Linux
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / escala / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024 / escala / 1024,
+    }
+
+def resumir(valores):
+    valores = sorted(valores)
+    if not valores:
+        return None
+    return {
+        "count": len(valores),
+        "total": round(sum(valores), 4),
+        "mean": round(statistics.mean(valores), 4),
+        "p50": round(statistics.median(valores), 4),
+        "p95": round(valores[min(len(valores) - 1, int(len(valores) * 0.95))], 4),
+        "max": round(valores[-1], 4),
+    }
+
+def executar(args):
+    area = tempfile.mkdtemp(prefix="ytdl-bench-")
+    # Antes de importar o programa: config, histórico, diário e caches na pasta temporária
+    os.chdir(area)
+    sys.path.insert(0, RAIZ)
+    import logging
+    from src.utils.helpers import logger
+    logger.setLevel(logging.WARNING)
+    from src.config.config import APP_VERSION
+    from src.core.downloader import GerenciadorDownload
+    from src.core.fila import ESTADO_CONCLUIDO
+
+    servidor, base_url = iniciar_servidor(area)
+    formatos = gerar_midias(os.path.join(area, "media"), args.size_mb, args.ffmpeg)
+    ids = gerar_infos(os.path.join(area, "info"), base_url, formatos, args.jobs)
+
+    gerenciador = GerenciadorDownload(max_simultaneos=args.concurrency)
+    destino = os.path.join(area, "downloads")
+
+    # Extração simulada: buscar o info dict no servidor e guardá-lo no cache
+    extracoes = {}
+    for id_video in ids:
+        inicio = time.perf_counter()
+        with urllib.request.urlopen(f"{base_url}/info/{id_video}.json") as resposta:
+            info = json.load(resposta)
+        gerenciador.cache_info.salvar(id_video, info)
+        extracoes[id_video] = time.perf_counter() - inicio
+
+    # extrair_info percorre validação e cache, como a interface faz ao colar a URL
+    inicio = time.perf_counter()
+    for id_video in ids:
+        gerenciador.extrair_info(f"https://www.youtube.com/watch?v={id_video}")
+    tempo_extrair_info = time.perf_counter() - inicio
+
+    tipos = {"audio": ["audio"], "video": ["video"], "mixed": ["audio", "video"]}[args.type]
+    inicio = time.perf_counter()
+    tarefas = []
+    for n, id_video in enumerate(ids):
+        tipo = tipos[n % len(tipos)]
+        opcoes = {"duplicate_policy": "overwrite"}
+        if tipo == "audio":
+            opcoes.update(quality="192", audio_format="mp3")
+        else:
+            opcoes.update(format="mp4", quality="720p")
+        tarefas.append(gerenciador.enfileirar(f"https://www.youtube.com/watch?v={id_video}", destino, tipo, **opcoes))
+    gerenciador.fila.aguardar()
+    duracao = time.perf_counter() - inicio
+    gerenciador.fila.encerrar()
+    servidor.shutdown()
+
+    concluidas = [t for t in tarefas if t.estado == ESTADO_CONCLUIDO]
+    fases = {}
+    for tarefa in concluidas:
+        for fase, segundos in tarefa.tempos.items():
+            fases.setdefault(fase, []).append(segundos)
+        fases.setdefault("extracao_simulada", []).append(extracoes[extrair_id(tarefa.url)])
+
+    etapas = {}
+    for etapa, nomes in ETAPAS.items():
+        por_tarefa = [sum(t.tempos.get(nome, 0) for nome in nomes) for t in concluidas]
+        if etapa == "extract":
+            por_tarefa = [s + extracoes[extrair_id(t.url)] for s, t in zip(por_tarefa, concluidas)]
+        etapas[etapa] = resumir(por_tarefa)
+
+    resultado = {
+        "version": APP_VERSION,
+        "commit": commit_atual(),
+        "params": {"jobs": args.jobs, "type": args.type, "size_mb": args.size_mb,
+                   "concurrency": args.concurrency, "ffmpeg": args.ffmpeg},
+        "wall_seconds": round(duracao, 3),
+        "succeeded": len(concluidas),
+        "failed": [{"url": t.url, "error": t.erro} for t in tarefas if t.estado != ESTADO_CONCLUIDO],
+        "jobs_per_minute": round(len(concluidas) / duracao * 60, 2) if duracao else None,
+        "bytes_downloaded": sum(t.bytes_baixados for t in concluidas),
+        "extract_info_ms": round(tempo_extrair_info / len(ids) * 1000, 3),
+        "stages": etapas,
+        "phases": {fase: resumir(valores) for fase, valores in sorted(fases.items())},
+        "peak_rss_mb": pico_rss_mb(),
+    }
+    os.chdir(RAIZ)
+    if not args.keep:
+        shutil.rmtree(area, ignore_errors=True)
+    return resultado
+
+def extrair_id(url):
+    return url.rsplit("=", 1)[-1]
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(atual, base):
+    """Diferença percentual entre duas execuções (negativo = mais rápido)."""
+    def variacao(novo, antigo):
+        return f"{(novo - antigo) / antigo * 100:+.1f}%" if novo is not None and antigo else "n/d"
+
+    linhas = [f"tarefas/min: {base['jobs_per_minute']} -> {atual['jobs_per_minute']} "
+              f"({variacao(atual['jobs_per_minute'], base['jobs_per_minute'])})"]
+    for etapa, resumo in atual["stages"].items():
+        anterior = (base.get("stages") or {}).get(etapa)
+        if resumo and anterior:
+            linhas.append(f"{etapa}: média {anterior['mean']:.4f}s -> {resumo['mean']:.4f}s "
+                          f"({variacao(resumo['mean'], anterior['mean'])})")
+    return "\n".join(linhas)
+
+def principal(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de download com um servidor local.")
+    parser.add_argument("--jobs", type=int, default=10, help="Quantidade de downloads")
+    parser.add_argument("--type", choices=["audio", "video", "mixed"], default="mixed")
+    parser.add_argument("--size-mb", type=float, default=2.0, help="Tamanho aproximado de cada mídia")
+    parser.add_argument("--concurrency", type=int, default=3, help="Downloads simultâneos")
+    parser.add_argument("--ffmpeg", action="store_true", help="Usar mídias reais e conversões com o FFmpeg")
+    parser.add_argument("--output", help="Arquivo JSON com o resultado (padrão: stdout)")
+    parser.add_argument("--baseline", help="Resultado anterior para comparação")
+    parser.add_argument("--keep", action="store_true", help="Não apagar a pasta temporária")
+    args = parser.parse_args(argv)
+
+    if args.ffmpeg and not shutil.which("ffmpeg"):
+        parser.error("--ffmpeg requer o FFmpeg no PATH")
+
+    resultado = executar(args)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            print(comparar(resultado, json.load(f)), file=sys.stderr)
+    return 0 if not resultado["failed"] else 1
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -0,0 +1,7 @@
+import multiprocessing
+import sys
+from src.cli import principal
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(principal())
@@ -1,16 +1,28 @@
+import multiprocessing
 import traceback
+from src.utils.helpers import marcar_inicializacao, configurar_logging
+from src.config.config import carregar_config
 from PyQt5.QtWidgets import QApplication
 from src.ui.main_window import JanelaDownloaderYouTube
-from tkinter import messagebox
+
+marcar_inicializacao("importações")
 
 def principal():
+    # Arquivo de log, nível e formato vêm do config.json
+    configurar_logging(carregar_config())
     try:
         app = QApplication([])
+        marcar_inicializacao("QApplication")
         window = JanelaDownloaderYouTube()
+        marcar_inicializacao("janela")
         window.show()
         app.exec_()
     except Exception as e:
+        # tkinter só é carregado se for preciso mostrar o erro
+        from tkinter import messagebox
         messagebox.showerror("Erro", traceback.format_exc())
 
 if __name__ == "__main__":
-    principal()
\ No newline at end of file
+    # Necessário para o pool de processos das capas no executável congelado
+    multiprocessing.freeze_support()
+    principal()
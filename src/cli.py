@@ -0,0 +1,220 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+from src.config.config import carregar_config
+from src.core.downloader import GerenciadorDownload
+from src.core.eventos import OuvinteDownload
+from src.core.fila import ESTADO_CONCLUIDO
+from src.core.metricas import obter_metricas
+from src.core.progresso import formatar_bytes
+from src.utils.helpers import logger, eh_url_playlist, configurar_logging
+
+class RelatorioProgresso(OuvinteDownload):
+    """Escreve o progresso dos downloads em texto simples ou JSON lines."""
+
+    def __init__(self, saida=sys.stdout, formato_json=False):
+        self.saida = saida
+        self.formato_json = formato_json
+        self._ultimo_progresso = {}
+        self.erros_gerais = 0
+        self._lock = threading.Lock()
+
+    def _escrever(self, evento, texto):
+        self._escrever_lote([(evento, texto)])
+
+    def _escrever_lote(self, registros):
+        """Escreve vários eventos com uma única escrita e um único flush."""
+        if not registros:
+            return
+        with self._lock:
+            linhas = []
+            for evento, texto in registros:
+                if self.formato_json:
+                    evento["time"] = round(time.time(), 3)
+                    linhas.append(json.dumps(evento, ensure_ascii=False))
+                else:
+                    linhas.append(texto)
+            self.saida.write("\n".join(linhas) + "\n")
+            self.saida.flush()
+
+    def ao_progresso_lote(self, estados):
+        # Um lote por publicação do agregador, em vez de uma escrita por tarefa
+        registros = []
+        for info in estados:
+            id_tarefa, valor = info['id_tarefa'], int(info['percent'])
+            # Só reporta quando a porcentagem inteira muda
+            if self._ultimo_progresso.get(id_tarefa) == valor:
+                continue
+            self._ultimo_progresso[id_tarefa] = valor
+            registros.append((
+                {"event": "progress", "job": id_tarefa, "percent": valor,
+                 "speed": info.get('speed'), "eta": info.get('eta'),
+                 "rate_allocated": info.get('rate_allocated'), "rate_achieved": info.get('rate_achieved')},
+                f"[{id_tarefa}] {valor}% | Velocidade: {info.get('speed')} | Tempo restante: {info.get('eta')}"
+                + (f" | Banda alocada: {formatar_bytes(info['rate_allocated'])}/s" if info.get('rate_allocated') else "")
+            ))
+        self._escrever_lote(registros)
+
+    def ao_info(self, info):
+        if info.get('_type') != 'playlist':
+            return
+        self._escrever(
+            {"event": "playlist", "id": info.get('id'), "title": info.get('title'),
+             "count": info.get('playlist_count'), "skipped": info.get('skipped')},
+            f"Playlist '{info.get('title')}': {info.get('playlist_count')} vídeos, {info.get('skipped')} já baixados"
+        )
+
+    def ao_erro(self, mensagem, id_tarefa=None):
+        # Erros de tarefas são reportados em finalizado(); aqui só os gerais
+        if id_tarefa is None:
+            self.erros_gerais += 1
+            self._escrever({"event": "error", "error": mensagem}, f"Erro: {mensagem}")
+
+    def enfileirado(self, tarefa):
+        self._escrever(
+            {"event": "queued", "job": tarefa.id, "url": tarefa.url, "type": tarefa.tipo},
+            f"[{tarefa.id}] Enfileirado: {tarefa.url}"
+        )
+
+    def finalizado(self, tarefa):
+        resultado = tarefa.resultado or {}
+        self._escrever(
+            {"event": "finished", "job": tarefa.id, "url": tarefa.url, "state": tarefa.estado,
+             "title": resultado.get('title'), "path": resultado.get('path'), "error": tarefa.erro,
+             "throughput": resultado.get('throughput'), "timings": resultado.get('timings')},
+            f"[{tarefa.id}] {tarefa.estado}: {resultado.get('path') or tarefa.erro or tarefa.url}"
+        )
+
+def ler_urls(origem):
+    """Lê URLs de um arquivo (ou '-' para stdin), ignorando linhas vazias e comentários."""
+    if origem == "-":
+        linhas = sys.stdin.readlines()
+    else:
+        with open(origem, "r", encoding="utf-8") as f:
+            linhas = f.readlines()
+    return [linha.strip() for linha in linhas if linha.strip() and not linha.strip().startswith("#")]
+
+def criar_parser(config):
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Baixa áudios e vídeos do YouTube sem interface gráfica."
+    )
+    parser.add_argument("urls", nargs="*", help="URLs para baixar")
+    parser.add_argument("-i", "--input", dest="arquivo",
+                        help="Arquivo com uma URL por linha ('-' para ler do stdin)")
+    parser.add_argument("-o", "--output", dest="destino", default=config.get("default_path"),
+                        help="Pasta de destino")
+    parser.add_argument("--video", action="store_true", help="Baixar vídeo em vez de áudio MP3")
+    parser.add_argument("--audio-quality", default=config.get("audio_quality", "320"),
+                        choices=["128", "192", "320"], help="Qualidade do MP3 em kbps")
+    parser.add_argument("--audio-format", default=config.get("audio_format", "mp3"),
+                        choices=["mp3", "m4a", "opus", "original"],
+                        help="Formato do áudio; m4a, opus e original evitam recodificar")
+    parser.add_argument("--video-format", default=config.get("video_format", "mp4"),
+                        choices=["mp4", "mkv"], help="Formato do vídeo")
+    parser.add_argument("--video-quality", default=config.get("video_quality", "720p"),
+                        choices=["360p", "480p", "720p", "1080p"], help="Qualidade do vídeo")
+    parser.add_argument("-j", "--jobs", type=int, default=config.get("max_concurrent_downloads", 3),
+                        help="Número de downloads simultâneos")
+    parser.add_argument("--duplicates", default=config.get("duplicate_policy", "skip"),
+                        choices=["skip", "overwrite", "retag"],
+                        help="O que fazer com vídeos já baixados: pular, baixar de novo ou só refazer as tags (MP3)")
+    parser.add_argument("--fragments", type=int, default=config.get("concurrent_fragments", 4),
+                        help="Fragmentos DASH/HLS baixados em paralelo por download")
+    parser.add_argument("--downloader", default=config.get("external_downloader") or "native",
+                        choices=["native", "aria2c"], help="Downloader usado na transferência")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Limite de banda em KiB/s para todos os downloads (0 = sem limite)")
+    parser.add_argument("--weight", type=float, default=1,
+                        help="Peso destes downloads na divisão da banda limitada")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retomar os downloads interrompidos da última execução")
+    parser.add_argument("--trace", metavar="ARQUIVO",
+                        help="Gravar as fases de cada tarefa (spans) em JSON lines")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Expor métricas no formato do Prometheus em http://127.0.0.1:PORTA/metrics")
+    parser.add_argument("--json", action="store_true", help="Reportar progresso em JSON lines")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Exibir apenas avisos e erros no log")
+    return parser
+
+def principal(argv=None):
+    config = carregar_config()
+    args = criar_parser(config).parse_args(argv)
+    configurar_logging(config)
+
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+        logger.setLevel(logging.WARNING)
+
+    urls = list(args.urls)
+    if args.arquivo:
+        urls.extend(ler_urls(args.arquivo))
+    if not urls and not args.resume:
+        logger.error("Nenhuma URL informada")
+        return 2
+
+    metricas = obter_metricas()
+    if args.trace:
+        metricas.gravar_em(args.trace)
+    if args.metrics_port is not None:
+        metricas.iniciar_servidor(args.metrics_port)
+
+    relatorio = RelatorioProgresso(formato_json=args.json)
+    gerenciador = GerenciadorDownload(max_simultaneos=args.jobs)
+    gerenciador.adicionar_ouvinte(relatorio)
+    if args.limit is not None:
+        # Substitui o limite e a agenda do config.json nesta execução
+        gerenciador.limitador.limite = args.limit
+        gerenciador.limitador.agenda = []
+
+    if args.video:
+        tipo, opcoes = "video", {"format": args.video_format, "quality": args.video_quality}
+    else:
+        tipo, opcoes = "audio", {"quality": args.audio_quality, "audio_format": args.audio_format}
+    opcoes["duplicate_policy"] = args.duplicates
+    opcoes["concurrent_fragments"] = args.fragments
+    opcoes["external_downloader"] = "" if args.downloader == "native" else args.downloader
+    opcoes["bandwidth_weight"] = args.weight
+
+    tarefas = []
+    if args.resume:
+        # As tarefas retomadas mantêm o destino e as opções com que foram criadas
+        for tarefa in gerenciador.retomar_pendentes():
+            relatorio.enfileirado(tarefa)
+            tarefas.append(tarefa)
+
+    for url in urls:
+        if eh_url_playlist(url):
+            novas = gerenciador.enfileirar_playlist(url, args.destino, tipo, **opcoes)
+        else:
+            novas = [gerenciador.enfileirar(url, args.destino, tipo, **opcoes)]
+        for tarefa in novas:
+            relatorio.enfileirado(tarefa)
+        tarefas.extend(novas)
+
+    if not tarefas:
+        logger.warning("Nenhum download a fazer")
+        return 1 if relatorio.erros_gerais else 0
+
+    try:
+        for tarefa in tarefas:
+            # Espera em intervalos curtos para que Ctrl+C seja atendido
+            while not tarefa.concluida.wait(0.5):
+                pass
+            relatorio.finalizado(tarefa)
+    except KeyboardInterrupt:
+        logger.warning("Interrompido pelo usuário. Cancelando downloads...")
+        gerenciador.fila.cancelar_todos()
+        gerenciador.fila.aguardar()
+        return 130
+
+    gerenciador.fila.encerrar()
+    cache = gerenciador.cache_info.estatisticas()
+    logger.info(f"Cache de informações: {cache['hits']} acerto(s), {cache['misses']} falha(s), "
+                f"{cache['entries']} entrada(s), {formatar_bytes(cache['bytes'])}")
+    sucesso = all(t.estado == ESTADO_CONCLUIDO for t in tarefas) and not relatorio.erros_gerais
+    return 0 if sucesso else 1
@@ -1,5 +1,8 @@
+import copy
 import json
 import os
+import tempfile
+import threading
 from src.utils.helpers import logger, get_resource_path
 
 # Altere a definição do ARQUIVO_CONFIG
@@ -8,11 +11,38 @@ ARQUIVO_CONFIG = get_resource_path("config.json")
 CONFIG_PADRAO = {
     "default_path": "C:/downloads",
     "audio_quality": "320",  # Opções: "128", "192", "320"
+    "audio_format": "mp3",  # Opções: "mp3", "m4a", "opus", "original" (sem recodificar)
     "theme": "dark",  # Opções: "dark", "light"
     "video_format": "mp4",  # Opções: "mp4", "mkv"
     "video_quality": "720p",  # Opções: "360p", "480p", "720p", "1080p"
     "apply_metadata": True,
-    "save_thumbnails": True
+    "save_thumbnails": True,
+    "max_concurrent_downloads": 3,  # Downloads simultâneos na fila
+    "postprocess_workers": 0,  # Conversões FFmpeg simultâneas; 0 = metade dos núcleos
+    "info_cache_ttl": 14400,  # Segundos até expirar informações em cache
+    "info_cache_max_mb": 100,  # Tamanho máximo do cache de informações
+    "ytdlp_pool_size": 4,  # Instâncias ociosas do yt-dlp mantidas por perfil de opções
+    "history_max_entries": 0,  # 0 = histórico sem limite
+    "history_retention_days": 0,  # 0 = manter registros para sempre
+    "duplicate_policy": "skip",  # Opções: "skip", "overwrite", "retag"
+    "cover_size": 800,  # Lado máximo, em pixels, da capa gravada nas tags
+    "cover_quality": 90,  # Qualidade JPEG da capa
+    "cover_workers": 2,  # Processos dedicados ao tratamento das capas
+    "progress_interval_ms": 250,  # Intervalo mínimo entre atualizações de progresso de cada download
+    "log_level": "INFO",  # Opções: "DEBUG", "INFO", "WARNING", "ERROR"
+    "log_dir": "",  # Pasta dos logs; "" = pasta padrão do aplicativo
+    "log_rotation": "size",  # Opções: "size" (log_max_mb) ou "daily" (meia-noite)
+    "log_max_mb": 5,  # Tamanho de cada arquivo de log antes da rotação
+    "log_backups": 5,  # Arquivos de log antigos mantidos
+    "log_json": False,  # Gravar o arquivo de log em JSON lines, com o ID da tarefa
+    "metrics_file": "",  # Arquivo JSON lines com as fases de cada tarefa; "" = desativado
+    "update_check_interval_hours": 24,  # Intervalo entre consultas automáticas de atualização
+    "last_update_check": 0,  # Momento (timestamp) da última consulta de atualização
+    "ignored_version": "",  # Versão que o usuário pediu para ignorar
+    "concurrent_fragments": 4,  # Fragmentos DASH/HLS baixados em paralelo
+    "external_downloader": "",  # Opções: "" (interno do yt-dlp), "aria2c"
+    "bandwidth_limit": 0,  # KiB/s somando todos os downloads; 0 = sem limite
+    "bandwidth_schedule": []  # Ex.: [{"start": "09:00", "end": "18:00", "limit": 2048}]
 }
 
 APP_VERSION = "1.1.1"  # Versão do aplicativo
@@ -23,48 +53,193 @@ REPO_INFO = {
     "name": "YT-Downloader"  # Substitua pelo nome do seu repositório
 }
 
+def _normalizar(config):
+    """Completa as chaves ausentes e corrige valores com tipo diferente do padrão."""
+    normalizada = dict(config)
+    for key, padrao in CONFIG_PADRAO.items():
+        if key not in normalizada:
+            normalizada[key] = copy.deepcopy(padrao)
+            continue
+        valor = normalizada[key]
+        if isinstance(padrao, bool):
+            valido = isinstance(valor, bool)
+        elif isinstance(padrao, (int, float)):
+            if isinstance(valor, str):
+                # Números gravados como texto ("4") ainda são aceitos
+                try:
+                    valor = normalizada[key] = type(padrao)(valor)
+                except ValueError:
+                    pass
+            valido = isinstance(valor, (int, float)) and not isinstance(valor, bool)
+        else:
+            valido = isinstance(valor, type(padrao))
+        if not valido:
+            logger.warning(f"Valor inválido para '{key}' no config.json ({valor!r}); usando o padrão")
+            normalizada[key] = copy.deepcopy(padrao)
+    return normalizada
+
+class ServicoConfig:
+    """Configurações em memória, compartilhadas por todo o programa.
+
+    O config.json só é lido de novo quando a data de modificação ou o
+    tamanho do arquivo mudam (edição manual, outra instância) ou depois de
+    `salvar`. A gravação usa um arquivo temporário renomeado por cima do
+    original, para nunca deixar um JSON pela metade. Funções inscritas com
+    `inscrever` recebem um dicionário com as chaves alteradas.
+    """
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self._lock = threading.RLock()
+        self._config = None
+        self._assinatura = None
+        self._inscritos = []
+
+    def _assinatura_arquivo(self):
+        try:
+            estado = os.stat(self.arquivo)
+        except OSError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size)
+
+    def _ler_arquivo(self):
+        try:
+            if os.path.exists(self.arquivo):
+                with open(self.arquivo, "r", encoding="utf-8") as f:
+                    return _normalizar(json.load(f))
+        except Exception as e:
+            logger.error(f"Erro ao carregar configurações: {str(e)}")
+        return copy.deepcopy(CONFIG_PADRAO)
+
+    def _atual(self):
+        """Configuração em cache, relida se o arquivo mudou (chamar com o lock)."""
+        assinatura = self._assinatura_arquivo()
+        if self._config is not None and assinatura == self._assinatura:
+            return self._config, {}
+        anterior = self._config
+        self._config = self._ler_arquivo()
+        self._assinatura = assinatura
+        if anterior is None:
+            return self._config, {}
+        return self._config, self._diferenca(anterior, self._config)
+
+    @staticmethod
+    def _diferenca(anterior, nova):
+        return {key: valor for key, valor in nova.items() if anterior.get(key) != valor}
+
+    def carregar(self):
+        """Cópia da configuração atual."""
+        with self._lock:
+            config, alteracoes = self._atual()
+            copia = copy.deepcopy(config)
+        self._notificar(alteracoes)
+        return copia
+
+    def obter(self, key, default=None):
+        with self._lock:
+            config, alteracoes = self._atual()
+            valor = copy.deepcopy(config.get(key, default))
+        self._notificar(alteracoes)
+        return valor
+
+    def salvar(self, data):
+        """Grava a configuração completa; retorna False em caso de erro."""
+        with self._lock:
+            sucesso, alteracoes = self._salvar(data)
+        self._notificar(alteracoes)
+        return sucesso
+
+    def atualizar(self, valores):
+        """Altera só as chaves informadas, preservando o resto do arquivo."""
+        with self._lock:
+            config, alteracoes_disco = self._atual()
+            sucesso, alteracoes = self._salvar({**config, **valores})
+        self._notificar(dict(alteracoes_disco, **alteracoes))
+        return sucesso
+
+    def _salvar(self, data):
+        # Chamado com o lock adquirido; retorna (sucesso, chaves alteradas)
+        anterior, alteracoes = self._atual()
+        nova = _normalizar(data)
+        try:
+            self._gravar(nova)
+        except Exception as e:
+            logger.error(f"Erro ao salvar configurações: {str(e)}")
+            return False, alteracoes
+        self._config = nova
+        self._assinatura = self._assinatura_arquivo()
+        return True, dict(alteracoes, **self._diferenca(anterior, nova))
+
+    def _gravar(self, config):
+        diretorio = os.path.dirname(os.path.abspath(self.arquivo))
+        descritor, temporario = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=diretorio)
+        try:
+            with os.fdopen(descritor, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+            raise
+
+    def inscrever(self, funcao):
+        """`funcao(alteracoes)` é chamada após cada mudança, na thread que a detectou."""
+        with self._lock:
+            if funcao not in self._inscritos:
+                self._inscritos.append(funcao)
+
+    def cancelar_inscricao(self, funcao):
+        with self._lock:
+            if funcao in self._inscritos:
+                self._inscritos.remove(funcao)
+
+    def _notificar(self, alteracoes):
+        if not alteracoes:
+            return
+        with self._lock:
+            inscritos = list(self._inscritos)
+        for funcao in inscritos:
+            try:
+                funcao(dict(alteracoes))
+            except Exception as e:
+                logger.error(f"Erro ao notificar mudança de configurações: {str(e)}")
+
+servico_config = ServicoConfig(ARQUIVO_CONFIG)
+
 def carregar_config():
     """Carrega configurações do arquivo ou retorna padrões."""
-    try:
-        if os.path.exists(ARQUIVO_CONFIG):
-            with open(ARQUIVO_CONFIG, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                
-                # Garantir que todas as chaves padrão existam
-                for key, value in CONFIG_PADRAO.items():
-                    if key not in config:
-                        config[key] = value
-                
-                return config
-        return CONFIG_PADRAO.copy()
-    except Exception as e:
-        logger.error(f"Erro ao carregar configurações: {str(e)}")
-        return CONFIG_PADRAO.copy()
+    return servico_config.carregar()
 
 def salvar_config(data):
     """Salva configurações no arquivo."""
-    try:
-        with open(ARQUIVO_CONFIG, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao salvar configurações: {str(e)}")
-        return False
+    return servico_config.salvar(data)
 
 def obter_valor_config(key, default=None):
     """Recupera um valor específico das configurações."""
-    config = carregar_config()
-    return config.get(key, default)
+    return servico_config.obter(key, default)
 
 def atualizar_valor_config(key, value):
     """Atualiza um valor específico nas configurações."""
-    config = carregar_config()
-    config[key] = value
-    return salvar_config(config)
+    return servico_config.atualizar({key: value})
+
+def atualizar_valores_config(valores):
+    """Atualiza várias chaves de uma vez, sem sobrescrever as demais."""
+    return servico_config.atualizar(valores)
+
+def inscrever_config(funcao):
+    """Registra `funcao(alteracoes)` para ser avisada de mudanças nas configurações."""
+    servico_config.inscrever(funcao)
+
+def cancelar_inscricao_config(funcao):
+    servico_config.cancelar_inscricao(funcao)
 
 def redefinir_para_padrao():
     """Redefine configurações para os valores padrão."""
-    return salvar_config(CONFIG_PADRAO.copy())
+    return salvar_config(copy.deepcopy(CONFIG_PADRAO))
 
 def get_app_version():
     """Retorna a versão atual do aplicativo."""
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from src.utils.helpers import logger
+
+class LimitadorBanda:
+    """Limite global de banda compartilhado por todos os downloads.
+
+    O limite (KiB/s, 0 = sem limite) pode variar conforme o horário. Ele é
+    dividido entre as tarefas ativas proporcionalmente ao peso de cada uma, e
+    cada tarefa consome de um balde de fichas (token bucket) com a sua parte.
+    O consumo acontece no gancho de progresso do yt-dlp: quando o balde
+    esvazia, a thread que está baixando espera, o que reduz a vazão.
+    """
+
+    def __init__(self, limite=0, agenda=None, rajada=1.0, janela=1.0):
+        self.limite = limite
+        self.agenda = list(agenda or [])
+        self.rajada = rajada  # Segundos de transferência acumuláveis no balde
+        self.janela = janela  # Segundos considerados no cálculo da vazão obtida
+        self._tarefas = {}  # id -> estado do balde da tarefa
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _minutos(hora):
+        horas, minutos = hora.split(":")
+        return int(horas) * 60 + int(minutos)
+
+    def limite_atual(self, agora=None):
+        """Limite em bytes/s vigente no horário (0 = sem limite).
+
+        Cada item da agenda tem "start", "end" (HH:MM) e "limit" (KiB/s); faixas
+        que atravessam a meia-noite (ex.: 22:00-06:00) são aceitas.
+        """
+        agora = agora or datetime.now()
+        minuto = agora.hour * 60 + agora.minute
+        for faixa in self.agenda:
+            try:
+                inicio, fim = self._minutos(faixa["start"]), self._minutos(faixa["end"])
+            except (KeyError, ValueError, AttributeError):
+                logger.warning(f"Faixa de horário inválida na agenda de banda: {faixa}")
+                continue
+            dentro = inicio <= minuto < fim if inicio <= fim else (minuto >= inicio or minuto < fim)
+            if dentro:
+                return int(faixa.get("limit", 0)) * 1024
+        return int(self.limite or 0) * 1024
+
+    def registrar(self, tarefa, peso=1):
+        agora = time.monotonic()
+        with self._lock:
+            self._tarefas[tarefa.id] = {
+                'peso': max(0.01, float(peso)),
+                'fichas': 0.0,
+                'ultimo': agora,
+                'arquivo': None,
+                'baixados': 0,
+                # (instante, bytes recebidos); a primeira amostra marca o início da janela
+                'amostras': deque([(agora, 0)]),
+            }
+
+    def liberar(self, tarefa):
+        with self._lock:
+            self._tarefas.pop(tarefa.id, None)
+
+    def _alocada(self, id_tarefa, limite):
+        peso_total = sum(estado['peso'] for estado in self._tarefas.values())
+        return limite * self._tarefas[id_tarefa]['peso'] / peso_total
+
+    def _obtida(self, estado, agora):
+        """Vazão obtida (bytes/s): bytes recebidos na última janela sobre o tempo real."""
+        amostras = estado['amostras']
+        while len(amostras) > 1 and amostras[1][0] <= agora - self.janela:
+            amostras.popleft()
+        decorrido = agora - amostras[0][0]
+        if decorrido <= 0:
+            return 0.0
+        return sum(recebidos for _, recebidos in list(amostras)[1:]) / decorrido
+
+    def consumir(self, tarefa, d):
+        """Desconta os bytes recebidos desde a última chamada e espera se preciso."""
+        with self._lock:
+            estado = self._tarefas.get(tarefa.id)
+            if estado is None:
+                return
+
+            # downloaded_bytes é cumulativo por arquivo; calcular o que chegou agora
+            baixados = d.get('downloaded_bytes') or 0
+            if d.get('filename') != estado['arquivo'] or baixados < estado['baixados']:
+                estado['arquivo'] = d.get('filename')
+                estado['baixados'] = 0
+            recebidos = baixados - estado['baixados']
+            estado['baixados'] = baixados
+
+            agora = time.monotonic()
+            decorrido = agora - estado['ultimo']
+            estado['ultimo'] = agora
+            estado['amostras'].append((agora, recebidos))
+
+            limite = self.limite_atual()
+            alocada = self._alocada(tarefa.id, limite) if limite else None
+            tarefa.banda_alocada = alocada
+            tarefa.banda_obtida = self._obtida(estado, agora)
+            if not alocada:
+                return
+
+            estado['fichas'] = min(alocada * self.rajada, estado['fichas'] + alocada * decorrido) - recebidos
+            espera = -estado['fichas'] / alocada if estado['fichas'] < 0 else 0
+
+        if espera:
+            # Fora do lock, para não bloquear as outras tarefas
+            time.sleep(espera)
+
+    def relatorio(self):
+        """Banda alocada e obtida (bytes/s) por tarefa ativa."""
+        with self._lock:
+            limite = self.limite_atual()
+            agora = time.monotonic()
+            return {
+                'limit': limite or None,
+                'jobs': [
+                    {'id_tarefa': id_tarefa, 'weight': estado['peso'],
+                     'allocated': self._alocada(id_tarefa, limite) if limite else None,
+                     'achieved': self._obtida(estado, agora)}
+                    for id_tarefa, estado in self._tarefas.items()
+                ]
+            }
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from src.utils.helpers import logger
+
+DIRETORIO_CACHE = os.path.join("cache", "info")
+
+# Margem de segurança antes da expiração das URLs de stream do YouTube
+MARGEM_EXPIRACAO = 300
+
+class CacheInfo:
+    """Cache em disco dos info dicts do yt-dlp, por ID de vídeo.
+
+    As entradas expiram pelo TTL configurado ou antes disso, se as URLs de
+    stream indicarem uma expiração menor. O tamanho total em disco é limitado,
+    removendo as entradas usadas há mais tempo (LRU).
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, ttl=14400, max_mb=100):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._indice = None  # id -> tamanho em bytes, do menos ao mais recente
+
+    def _caminho(self, id_video):
+        return os.path.join(self.diretorio, f"{id_video}.json")
+
+    def _carregar_indice(self):
+        """Monta o índice LRU a partir dos arquivos existentes (ordem de mtime)."""
+        if self._indice is not None:
+            return
+        self._indice = OrderedDict()
+        if not os.path.isdir(self.diretorio):
+            return
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".json"):
+                stat = os.stat(os.path.join(self.diretorio, nome))
+                arquivos.append((stat.st_mtime, nome[:-5], stat.st_size))
+        for _, id_video, tamanho in sorted(arquivos):
+            self._indice[id_video] = tamanho
+
+    def obter(self, id_video):
+        """Retorna o info dict em cache ou None se ausente/expirado."""
+        with self._lock:
+            self._carregar_indice()
+            if id_video not in self._indice:
+                self.falhas += 1
+                return None
+
+            caminho = self._caminho(id_video)
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    dados = json.load(f)
+            except Exception as e:
+                logger.warning(f"Entrada de cache inválida para {id_video}: {str(e)}")
+                self._remover(id_video)
+                self.falhas += 1
+                return None
+
+            if dados.get("expira_em", 0) <= time.time():
+                self._remover(id_video)
+                self.falhas += 1
+                return None
+
+            # Marcar como usado recentemente
+            self._indice.move_to_end(id_video)
+            try:
+                os.utime(caminho)
+            except OSError:
+                pass
+            self.acertos += 1
+            return dados["info"]
+
+    def salvar(self, id_video, info):
+        """Grava o info dict no cache e aplica o limite de tamanho."""
+        from yt_dlp import YoutubeDL
+        try:
+            conteudo = json.dumps({
+                "salvo_em": time.time(),
+                "expira_em": self._calcular_expiracao(info),
+                "info": YoutubeDL.sanitize_info(info, remove_private_keys=True)
+            })
+        except Exception as e:
+            logger.warning(f"Não foi possível serializar informações para o cache: {str(e)}")
+            return False
+
+        with self._lock:
+            self._carregar_indice()
+            try:
+                os.makedirs(self.diretorio, exist_ok=True)
+                caminho = self._caminho(id_video)
+                temporario = f"{caminho}.tmp"
+                with open(temporario, "w", encoding="utf-8") as f:
+                    f.write(conteudo)
+                os.replace(temporario, caminho)
+            except Exception as e:
+                logger.warning(f"Erro ao gravar cache de informações: {str(e)}")
+                return False
+
+            self._indice[id_video] = len(conteudo.encode("utf-8"))
+            self._indice.move_to_end(id_video)
+            self._aplicar_limite()
+            return True
+
+    def remover(self, id_video):
+        """Invalida a entrada de um vídeo."""
+        with self._lock:
+            self._carregar_indice()
+            self._remover(id_video)
+
+    def _remover(self, id_video):
+        self._indice.pop(id_video, None)
+        try:
+            os.remove(self._caminho(id_video))
+        except OSError:
+            pass
+
+    def _aplicar_limite(self):
+        total = sum(self._indice.values())
+        while total > self.max_bytes and len(self._indice) > 1:
+            id_antigo, tamanho = next(iter(self._indice.items()))
+            self._remover(id_antigo)
+            total -= tamanho
+
+    def _calcular_expiracao(self, info):
+        """Usa o menor entre o TTL e o parâmetro `expire` das URLs de stream."""
+        expiracao = time.time() + self.ttl
+        for formato in info.get("formats") or []:
+            query = urllib.parse.urlparse(formato.get("url") or "").query
+            expire = urllib.parse.parse_qs(query).get("expire")
+            if expire and expire[0].isdigit():
+                expiracao = min(expiracao, int(expire[0]) - MARGEM_EXPIRACAO)
+        return expiracao
+
+    def estatisticas(self):
+        """Contadores de acertos/falhas e ocupação do cache."""
+        with self._lock:
+            self._carregar_indice()
+            total = self.acertos + self.falhas
+            return {
+                "hits": self.acertos,
+                "misses": self.falhas,
+                "hit_rate": self.acertos / total if total else 0.0,
+                "entries": len(self._indice),
+                "bytes": sum(self._indice.values())
+            }
@@ -0,0 +1,174 @@
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from src.utils.helpers import logger
+from src.config.config import obter_valor_config
+
+DIRETORIO_CAPAS = os.path.join("cache", "capas")
+
+# Lado máximo padrão da capa gravada nas tags
+TAMANHO_CAPA = 800
+QUALIDADE_CAPA = 90
+TIMEOUT_THUMBNAIL = 15
+
+# Capas recentes mantidas em memória
+MAX_CAPAS_MEMORIA = 64
+
+_sessao = None
+_executor = None
+_pool_processos = None
+_memo = OrderedDict()
+_lock = threading.Lock()
+
+def configuracao_capa():
+    """Tamanho máximo e qualidade JPEG das capas, conforme as configurações."""
+    return (int(obter_valor_config("cover_size", TAMANHO_CAPA)),
+            int(obter_valor_config("cover_quality", QUALIDADE_CAPA)))
+
+def obter_sessao():
+    """Sessão HTTP compartilhada, reaproveitando conexões com o servidor de imagens."""
+    global _sessao
+    with _lock:
+        if _sessao is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+            _sessao.mount("https://", adaptador)
+            _sessao.mount("http://", adaptador)
+            _sessao.headers.update({'User-Agent': 'Mozilla/5.0'})
+        return _sessao
+
+def baixar_imagem(url):
+    """Baixa uma imagem pela sessão compartilhada. Retorna os bytes ou None."""
+    try:
+        response = obter_sessao().get(url, timeout=TIMEOUT_THUMBNAIL)
+        if response.status_code == 200:
+            return response.content
+        logger.warning(f"Não foi possível baixar a thumbnail: HTTP {response.status_code}")
+        return None
+    except Exception as e:
+        logger.error(f"Erro ao baixar thumbnail: {str(e)}")
+        return None
+
+def escolher_thumbnail(info, tamanho=TAMANHO_CAPA):
+    """Escolhe a menor thumbnail que ainda cubra `tamanho`, evitando baixar imagens enormes.
+
+    Sem dimensões conhecidas, usa a de maior preferência do yt-dlp.
+    """
+    thumbnails = [t for t in info.get('thumbnails') or [] if t.get('url')]
+    if not thumbnails:
+        return info.get('thumbnail')
+
+    com_dimensoes = [t for t in thumbnails if t.get('width') and t.get('height')]
+    suficientes = [t for t in com_dimensoes if max(t['width'], t['height']) >= tamanho]
+    if suficientes:
+        return min(suficientes, key=lambda t: t['width'] * t['height'])['url']
+
+    # A lista do yt-dlp vem em ordem crescente de qualidade; a ordenação é estável
+    return sorted(thumbnails, key=lambda t: t.get('preference') or 0)[-1]['url']
+
+def processar_capa(dados, tamanho=TAMANHO_CAPA, qualidade=QUALIDADE_CAPA):
+    """Converte a imagem para JPEG com no máximo `tamanho` pixels de lado."""
+    from PIL import Image
+    img = Image.open(io.BytesIO(dados))
+
+    # Já está no formato final: evitar decodificar e recodificar
+    if img.format == 'JPEG' and img.mode == 'RGB' and max(img.size) <= tamanho:
+        return dados
+
+    if max(img.size) > tamanho:
+        img.thumbnail((tamanho, tamanho))
+    thumb_io = io.BytesIO()
+    img.convert('RGB').save(thumb_io, 'JPEG', quality=qualidade)
+    return thumb_io.getvalue()
+
+def processar_capa_em_processo(dados, tamanho=TAMANHO_CAPA, qualidade=QUALIDADE_CAPA):
+    """Executa processar_capa em um pool de processos, fora do GIL das threads de download."""
+    global _pool_processos
+    with _lock:
+        if _pool_processos is None:
+            # "spawn": o fork de um processo com threads de download, o laço do Qt e
+            # conexões abertas pode herdar locks travados e deixar o filho preso
+            _pool_processos = ProcessPoolExecutor(
+                max_workers=max(1, int(obter_valor_config("cover_workers", 2))),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        pool = _pool_processos
+    try:
+        return pool.submit(processar_capa, dados, tamanho, qualidade).result()
+    except Exception as e:
+        # Pool indisponível (ex.: processo filho encerrado); processar na própria thread
+        logger.warning(f"Pool de processos de capas indisponível: {str(e)}")
+        return processar_capa(dados, tamanho, qualidade)
+
+def _caminho_capa(id_video, tamanho, qualidade):
+    return os.path.join(DIRETORIO_CAPAS, f"{id_video}_{tamanho}_{qualidade}.jpg")
+
+def _memorizar(chave, capa):
+    with _lock:
+        _memo[chave] = capa
+        _memo.move_to_end(chave)
+        while len(_memo) > MAX_CAPAS_MEMORIA:
+            _memo.popitem(last=False)
+
+def obter_capa(info):
+    """Retorna a capa processada (JPEG) do vídeo, memorizada por ID em memória e em disco."""
+    id_video = info.get('id')
+    tamanho, qualidade = configuracao_capa()
+    chave = (id_video, tamanho, qualidade)
+
+    if id_video:
+        with _lock:
+            if chave in _memo:
+                _memo.move_to_end(chave)
+                return _memo[chave]
+        caminho = _caminho_capa(id_video, tamanho, qualidade)
+        if os.path.exists(caminho):
+            with open(caminho, "rb") as f:
+                capa = f.read()
+            _memorizar(chave, capa)
+            return capa
+
+    url = escolher_thumbnail(info, tamanho)
+    if not url:
+        return None
+    dados = baixar_imagem(url)
+    if not dados:
+        return None
+
+    try:
+        capa = processar_capa_em_processo(dados, tamanho, qualidade)
+    except Exception as e:
+        logger.error(f"Erro ao processar thumbnail: {str(e)}")
+        return None
+
+    if id_video:
+        _memorizar(chave, capa)
+        try:
+            os.makedirs(DIRETORIO_CAPAS, exist_ok=True)
+            temporario = f"{caminho}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(capa)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar a capa em cache: {str(e)}")
+    return capa
+
+def obter_capa_async(info):
+    """Busca a capa em segundo plano, em paralelo ao download da mídia. Retorna um Future."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="capa")
+
+    # Cópia dos campos usados: o yt-dlp altera o info dict durante o download
+    copia = {
+        'id': info.get('id'),
+        'thumbnail': info.get('thumbnail'),
+        'thumbnails': [dict(t) for t in info.get('thumbnails') or []]
+    }
+    return _executor.submit(obter_capa, copia)
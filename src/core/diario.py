@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from src.utils.helpers import logger
+
+ARQUIVO_DIARIO = "download_jobs.db"
+
+# Etapas gravadas no diário. Tarefas concluídas ou com falha saem do diário;
+# as canceladas e as interrompidas por um fechamento inesperado ficam e são
+# retomadas na próxima execução (ou removidas se o usuário recusar)
+ETAPA_ENFILEIRADA = "enfileirada"
+ETAPA_BAIXANDO = "baixando"
+ETAPA_POS_PROCESSAMENTO = "pos_processamento"
+ETAPA_BAIXADA = "baixada"  # Arquivo final pronto, faltando metadados/histórico
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    caminho TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    opcoes TEXT NOT NULL,
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    etapa TEXT NOT NULL,
+    arquivo TEXT,
+    atualizado_em TEXT NOT NULL
+);
+"""
+
+_lock_diario = threading.Lock()
+_conexao = None
+
+def _obter_conexao():
+    global _conexao
+    if _conexao is None:
+        _conexao = sqlite3.connect(ARQUIVO_DIARIO, check_same_thread=False)
+        _conexao.row_factory = sqlite3.Row
+        _conexao.execute("PRAGMA journal_mode=WAL")
+        _conexao.executescript(ESQUEMA)
+    return _conexao
+
+def _executar(sql, parametros=()):
+    with _lock_diario:
+        conexao = _obter_conexao()
+        with conexao:
+            return conexao.execute(sql, parametros).fetchall()
+
+def _agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def registrar_tarefa(tarefa, etapa):
+    """Grava (ou regrava) a tarefa no diário na etapa informada.
+
+    Uma tarefa retomada usa o ID da entrada original, que é atualizada (e não
+    apagada e recriada) em uma única instrução.
+    """
+    try:
+        _executar(
+            "INSERT INTO tarefas (id, url, caminho, tipo, opcoes, prioridade, etapa, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET etapa = excluded.etapa, atualizado_em = excluded.atualizado_em",
+            (tarefa.id, tarefa.url, tarefa.caminho, tarefa.tipo, json.dumps(tarefa.opcoes),
+             tarefa.prioridade, etapa, _agora())
+        )
+    except Exception as e:
+        logger.error(f"Erro ao gravar tarefa no diário: {str(e)}")
+
+def atualizar_etapa(id_tarefa, etapa, arquivo=None):
+    """Avança a etapa de uma tarefa, guardando o arquivo gerado quando conhecido."""
+    try:
+        _executar(
+            "UPDATE tarefas SET etapa = ?, arquivo = COALESCE(?, arquivo), atualizado_em = ? WHERE id = ?",
+            (etapa, arquivo, _agora(), id_tarefa)
+        )
+    except Exception as e:
+        logger.error(f"Erro ao atualizar tarefa no diário: {str(e)}")
+
+def remover_tarefa(id_tarefa):
+    """Retira do diário uma tarefa que terminou ou que o usuário descartou."""
+    try:
+        _executar("DELETE FROM tarefas WHERE id = ?", (id_tarefa,))
+    except Exception as e:
+        logger.error(f"Erro ao remover tarefa do diário: {str(e)}")
+
+def listar_pendentes():
+    """Tarefas interrompidas, na ordem em que foram gravadas."""
+    try:
+        linhas = _executar("SELECT * FROM tarefas ORDER BY rowid")
+    except Exception as e:
+        logger.error(f"Erro ao ler o diário de tarefas: {str(e)}")
+        return []
+    pendentes = []
+    for linha in linhas:
+        registro = dict(linha)
+        registro["opcoes"] = json.loads(registro["opcoes"] or "{}")
+        pendentes.append(registro)
+    return pendentes
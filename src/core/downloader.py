@@ -1,296 +1,710 @@
 import os
-import re
-import sys
-import subprocess
-from yt_dlp import YoutubeDL
-from PyQt5.QtCore import QObject, pyqtSignal
-from src.utils.helpers import logger, validar_url_youtube, sanitizar_nome_arquivo
-from src.core.metadata import aplicar_metadados, extrair_artista_do_titulo, baixar_thumbnail
-from src.core.history import adicionar_ao_historico
+import shutil
+import threading
+from functools import partial
+from src.utils.helpers import logger, validar_url_youtube, sanitizar_nome_arquivo, extrair_id_video, definir_tarefa_log
+from src.core.metadata import aplicar_metadados, montar_tags, criar_extracao_com_tags, EXTENSOES_COM_TAGS
+from src.core.capas import obter_capa, obter_capa_async
+from src.core.history import adicionar_ao_historico, buscar_downloads
+from src.core.playlist import expandir_playlist
+from src.core.cache import CacheInfo
+from src.core import diario
+from src.core.fila import FilaDownload, TarefaDownload, ESTADO_CONCLUIDO, ESTADO_FALHOU, ESTADO_CANCELADO
+from src.core.eventos import PublicadorEventos, OuvinteCallbacks
+from src.core.progresso import AgregadorProgresso, formatar_bytes
+from src.core.banda import LimitadorBanda
+from src.core.formatos import FORMATOS_AUDIO, planejar_audio, planejar_video
+from src.core.posprocessamento import EstagioPosProcessamento
+from src.core.motor import obter_pool
+from src.core.metricas import obter_metricas
+from src.services.localizador_ffmpeg import obter_localizador
+# O yt_dlp é importado dentro dos métodos: é o módulo mais lento de carregar
+# e não é necessário para abrir a janela
+from src.config.config import obter_valor_config
 
-def configurar_ffmpeg():
-    """Configura o FFmpeg para o yt-dlp funcionar em executáveis compilados."""
-    try:
-        import ffmpeg
-        # Verificar se ffmpeg-python está funcionando
-        ffmpeg.probe('NUL' if os.name == 'nt' else '/dev/null')
-        return True
-    except:
-        logger.warning("ffmpeg-python não encontrado. Tentando FFmpeg do sistema...")
-        return False
+# O que fazer quando o vídeo já foi baixado e o arquivo ainda existe
+POLITICAS_DUPLICADOS = ("skip", "overwrite", "retag")
+
+# Perfil das instâncias do pool usadas só para extrair informações
+OPCOES_EXTRACAO = {'quiet': True, 'no_warnings': True, 'noplaylist': True}
 
 def verificar_ffmpeg():
     """Verifica se o FFmpeg está disponível no sistema."""
-    try:
-        subprocess.run(['ffmpeg', '-version'], 
-                      stdout=subprocess.PIPE, 
-                      stderr=subprocess.PIPE)
-        return True
-    except:
-        return False
+    return obter_localizador().disponivel
+
+class GerenciadorDownload(PublicadorEventos):
+    """Motor de download independente do Qt.
 
-class GerenciadorDownload(QObject):
-    sinal_progresso = pyqtSignal(int, dict)
-    sinal_erro = pyqtSignal(str)
-    sinal_sucesso = pyqtSignal(str, dict)
-    sinal_info = pyqtSignal(dict)
+    Os eventos são publicados para ouvintes (ver src.core.eventos), o que permite
+    usar o mesmo motor na interface, na CLI ou em testes.
+    """
     
-    def __init__(self):
+    def __init__(self, max_simultaneos=None):
         super().__init__()
-        self.download_atual = None
-        self.deve_cancelar = False
+        self.fila = None
+        self.max_simultaneos = max_simultaneos
+        self._tarefas_ativas = set()
+        # Tarefas iniciadas chamando baixar_audio/baixar_video diretamente, fora da fila
+        self._tarefas_diretas = set()
+        self._lock = threading.Lock()
+        self.politica_duplicados = obter_valor_config("duplicate_policy", "skip")
+        self.cache_info = CacheInfo(
+            ttl=obter_valor_config("info_cache_ttl", 14400),
+            max_mb=obter_valor_config("info_cache_max_mb", 100)
+        )
+        self.limitador = LimitadorBanda(
+            limite=obter_valor_config("bandwidth_limit", 0),
+            agenda=obter_valor_config("bandwidth_schedule", [])
+        )
+        self.progresso = AgregadorProgresso(
+            self, intervalo=obter_valor_config("progress_interval_ms", 250) / 1000
+        )
+        # Download e FFmpeg são etapas separadas: o limite de downloads simultâneos
+        # vale só para a transferência, e o pós-processamento tem seus próprios workers
+        self.limite_downloads = max_simultaneos or obter_valor_config("max_concurrent_downloads", 3)
+        self._vagas_download = threading.BoundedSemaphore(max(1, int(self.limite_downloads)))
+        self.pos_processamento = EstagioPosProcessamento(obter_valor_config("postprocess_workers", 0))
+        
+        metricas = obter_metricas()
+        metricas.registrar_medidor("ytdl_active_jobs", "Tarefas em andamento", lambda: len(self._tarefas_ativas))
+        metricas.registrar_medidor("ytdl_postprocess_queue_depth", "Tarefas aguardando o FFmpeg",
+                                   lambda: self.pos_processamento.profundidade)
+        metricas.registrar_medidor("ytdl_info_cache_hits_total", "Informações de vídeo obtidas do cache",
+                                   lambda: self.cache_info.acertos, tipo="counter")
+        metricas.registrar_medidor("ytdl_info_cache_misses_total", "Consultas ao cache sem informação válida",
+                                   lambda: self.cache_info.falhas, tipo="counter")
+        metricas.registrar_medidor("ytdl_info_cache_bytes", "Ocupação em disco do cache de informações",
+                                   lambda: self.cache_info.estatisticas()["bytes"])
+        metricas.registrar_medidor("ytdl_bandwidth_limit_bytes", "Limite global de banda vigente (0 = sem limite)",
+                                   lambda: self.limitador.relatorio()["limit"] or 0)
+        metricas.registrar_medidor("ytdl_bandwidth_allocated_bytes", "Banda alocada somando as tarefas ativas",
+                                   lambda: sum(j["allocated"] or 0 for j in self.limitador.relatorio()["jobs"]))
+        metricas.registrar_medidor("ytdl_bandwidth_achieved_bytes", "Vazão obtida somando as tarefas ativas",
+                                   lambda: round(sum(j["achieved"] for j in self.limitador.relatorio()["jobs"])))
+
+    def enfileirar(self, url, caminho, tipo="audio", prioridade=0, id_tarefa=None, **opcoes):
+        """Adiciona um download à fila de processamento simultâneo."""
+        with self._lock:
+            if self.fila is None:
+                # Threads extras para as tarefas que aguardam o FFmpeg não ocuparem
+                # as vagas de download
+                self.fila = FilaDownload(self, int(self.limite_downloads) + self.pos_processamento.workers)
+        return self.fila.adicionar(url, caminho, tipo, prioridade, id_tarefa, **opcoes)
+    
+    def retomar_pendentes(self):
+        """Reenfileira as tarefas canceladas ou interrompidas que ficaram no diário.
+
+        Downloads parciais continuam do último byte (arquivos .part); tarefas cujo
+        arquivo final já existia seguem direto para os metadados e o histórico.
+        Cada tarefa é reenfileirada com o mesmo ID, e a entrada do diário é
+        atualizada em uma única gravação: não há momento em que ela fique de fora.
+        """
+        tarefas = []
+        for registro in diario.listar_pendentes():
+            atual = self.fila.obter(registro['id']) if self.fila is not None else None
+            if atual is not None and not atual.finalizada:
+                continue  # Ainda está na fila desta execução
+            opcoes = registro['opcoes']
+            # O arquivo só é gravado quando chega à etapa "baixada" e é mantido depois
+            if registro['arquivo'] and os.path.exists(registro['arquivo']):
+                opcoes['arquivo_baixado'] = registro['arquivo']
+            logger.info(f"Retomando tarefa interrompida ({registro['etapa']}): {registro['url']}")
+            tarefas.append(self.enfileirar(registro['url'], registro['caminho'], registro['tipo'],
+                                           registro['prioridade'], registro['id'], **opcoes))
+        return tarefas
+    
+    def enfileirar_playlist(self, url, caminho, tipo="audio", prioridade=0, pular_baixados=True, **opcoes):
+        """Expande uma playlist ou canal e enfileira cada vídeo como uma tarefa.
+
+        Com a política de duplicados "skip", vídeos já baixados (no histórico e
+        em disco) nem chegam à fila, o que permite retomar uma playlist
+        interrompida executando-a novamente.
+        """
+        is_valid, msg_or_url = validar_url_youtube(url)
+        if not is_valid:
+            self.publicar('ao_erro', msg_or_url, None)
+            return []
+        
+        try:
+            info, entradas = expandir_playlist(msg_or_url)
+        except Exception as e:
+            logger.error(f"Erro ao expandir playlist: {str(e)}")
+            self.publicar('ao_erro', f"Erro ao obter vídeos da playlist: {str(e)}", None)
+            return []
+        
+        politica = opcoes.get('duplicate_policy', self.politica_duplicados)
+        if tipo == "audio":
+            # Todas as extensões que o formato de áudio pode gerar (ex.: "original")
+            formato_audio = opcoes.get('audio_format', obter_valor_config("audio_format", "mp3"))
+            extensao = FORMATOS_AUDIO.get(formato_audio, FORMATOS_AUDIO["mp3"])
+        else:
+            extensao = "." + opcoes.get('format', 'mp4').lower()
+        pular_baixados = pular_baixados and politica == "skip"
+        tarefas = []
+        for entrada in entradas:
+            if pular_baixados and self._buscar_duplicado(entrada['url'], tipo, extensao):
+                logger.info(f"Pulando vídeo já baixado: {entrada['title']} ({entrada['id']})")
+                continue
+            tarefas.append(self.enfileirar(entrada['url'], caminho, tipo, prioridade, **opcoes))
+        
+        self.publicar('ao_info', {
+            '_type': 'playlist',
+            'id': info.get('id'),
+            'title': info.get('title'),
+            'playlist_count': len(entradas),
+            'skipped': len(entradas) - len(tarefas)
+        })
+        return tarefas
+    
+    def _registrar_tarefa(self, tarefa):
+        definir_tarefa_log(tarefa.id)
+        with self._lock:
+            self._tarefas_ativas.add(tarefa)
+            if self.fila is None or self.fila.obter(tarefa.id) is None:
+                self._tarefas_diretas.add(tarefa)
+        diario.registrar_tarefa(tarefa, diario.ETAPA_BAIXANDO)
+    
+    def _liberar_tarefa(self, tarefa):
+        with self._lock:
+            self._tarefas_ativas.discard(tarefa)
+            self._tarefas_diretas.discard(tarefa)
+        if tarefa.token.cancelado:
+            # Canceladas (inclusive por Ctrl+C) ficam no diário para --resume;
+            # saem só se o usuário recusar a retomada
+            estado = ESTADO_CANCELADO
+        else:
+            estado = ESTADO_FALHOU if tarefa.erro else ESTADO_CONCLUIDO
+            diario.remover_tarefa(tarefa.id)
+        obter_metricas().registrar_tarefa(tarefa, estado)
+        definir_tarefa_log(None)
+        self.progresso.descarregar(tarefa)
     
     def extrair_info(self, url):
         """Extrai informações do vídeo sem baixar."""
         is_valid, msg = validar_url_youtube(url)
         if not is_valid:
-            self.sinal_erro.emit(msg)
+            self.publicar('ao_erro', msg, None)
             return None
             
         ydl_opts = {
             'quiet': True,
+            'noprogress': True,
             'no_warnings': True
         }
         
-        # Configurar FFmpeg se disponível
-        if configurar_ffmpeg():
-            try:
-                import ffmpeg
-                ydl_opts['ffmpeg_location'] = ffmpeg.__file__.replace('__init__.py', 'ffmpeg.exe')
-            except:
-                pass
-        
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                self.sinal_info.emit(info)
+            with obter_pool().emprestar(ydl_opts) as ydl:
+                info, _ = self._obter_info(ydl, url)
+                self.publicar('ao_info', info)
                 return info
         except Exception as e:
             logger.error(f"Erro ao extrair informações: {str(e)}")
-            self.sinal_erro.emit(f"Erro ao obter informações do vídeo: {str(e)}")
+            self.publicar('ao_erro', f"Erro ao obter informações do vídeo: {str(e)}", None)
             return None
     
-    def gancho(self, d):
-        """Atualizar o progresso de download."""
-        if self.deve_cancelar:
+    def gancho(self, d, tarefa):
+        """Repassa o progresso do yt-dlp ao agregador, que limita a taxa de publicação."""
+        if tarefa is not None and tarefa.token.cancelado:
             raise Exception("Download cancelado pelo usuário")
             
         if d['status'] == 'downloading':
-            progress_str = re.sub(r'\x1b\[[0-9;]*m', '', d.get('_percent_str', '0.0'))
-            progress_float = float(progress_str.replace('%','').strip())
-            
-            # Informações adicionais
-            info = {
-                'speed': d.get('_speed_str', 'N/A'),
-                'eta': d.get('_eta_str', 'N/A'),
-                'filename': d.get('filename', 'N/A'),
-                'total_bytes': d.get('total_bytes', 0)
-            }
+            # Pode bloquear a thread para respeitar o limite global de banda
+            self.limitador.consumir(tarefa, d)
+        if d['status'] in ('downloading', 'finished'):
+            self.progresso.registrar(d, tarefa)
+        if d['status'] == 'finished':
+            tarefa.bytes_baixados += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+    
+    def _pos_processar(self, ydl, info, tarefa):
+        """Executa na etapa do FFmpeg o pós-processamento adiado pelo download.
+
+        A vaga de download já foi devolvida: enquanto esta tarefa espera ou
+        recodifica, outra pode baixar. Atualiza os caminhos finais em `info`.
+        """
+        if not ydl.adiados:
+            return
+        diario.atualizar_etapa(tarefa.id, diario.ETAPA_POS_PROCESSAMENTO)
+        finais = self.pos_processamento.executar(ydl.executar_adiados, tarefa)
+        for baixado, final in zip(info.get('requested_downloads') or [], finais):
+            baixado['filepath'] = final.get('filepath') or baixado.get('filepath')
+    
+    def _obter_info(self, ydl, url, usar_cache=True):
+        """Extrai o info dict (sem processar formatos), consultando o cache antes.
+
+        Sem `ydl`, uma instância de extração é emprestada do pool quando o
+        cache não tem o vídeo. Retorna (info, veio_do_cache).
+        """
+        id_video = extrair_id_video(url)
+        if usar_cache and id_video:
+            info = self.cache_info.obter(id_video)
+            if info is not None:
+                logger.info(f"Informações de {id_video} obtidas do cache")
+                return info, True
+        
+        if ydl is None:
+            with obter_pool().emprestar(OPCOES_EXTRACAO) as ydl_info:
+                info = ydl_info.extract_info(url, download=False, process=False)
+        else:
+            info = ydl.extract_info(url, download=False, process=False)
+        if id_video:
+            self.cache_info.salvar(id_video, info)
+        return info, False
+    
+    def _processar_download(self, ydl, info, tarefa, url, do_cache=False):
+        """Baixa a partir de um info dict já extraído, sem nova requisição à página.
+
+        Ocupa uma das vagas de download; o pós-processamento fica registrado
+        em `ydl` para `_pos_processar`. Só durante a transferência a tarefa
+        recebe uma parte do limite de banda: extração, espera pela vaga, FFmpeg
+        e tags não reservam banda que outra tarefa poderia usar.
+        """
+        from yt_dlp.utils import DownloadError
+        with tarefa.medir('espera_download'):
+            self._vagas_download.acquire()
+        self.limitador.registrar(tarefa, tarefa.opcoes.get('bandwidth_weight', 1))
+        try:
+            bytes_antes = tarefa.bytes_baixados
+            with tarefa.medir('download') as span:
+                try:
+                    info.update(ydl.process_ie_result(info, download=True))
+                except DownloadError:
+                    if not do_cache or tarefa.token.cancelado:
+                        raise
+                    # URLs de stream em cache podem ter sido invalidadas antes do TTL
+                    logger.warning("Falha ao baixar com informações do cache. Extraindo novamente...")
+                    self.cache_info.remover(extrair_id_video(url))
+                    with tarefa.medir('extracao'):
+                        novo_info, _ = self._obter_info(ydl, url, usar_cache=False)
+                    info.clear()
+                    info.update(novo_info)
+                    ydl.adiados.clear()
+                    info.update(ydl.process_ie_result(info, download=True))
+                span['bytes'] = tarefa.bytes_baixados - bytes_antes
+        finally:
+            self.limitador.liberar(tarefa)
+            self._vagas_download.release()
+    
+    def _buscar_duplicado(self, url, tipo, extensao):
+        """Procura um download anterior do mesmo vídeo cujo arquivo ainda exista em disco.
+
+        `extensao` pode ser uma tupla com as extensões aceitas.
+        """
+        for registro in buscar_downloads(url, tipo):
+            caminho = registro.get('path')
+            if caminho and caminho.lower().endswith(extensao) and os.path.exists(caminho):
+                return registro
+        return None
+    
+    def _politica_duplicados(self, tarefa):
+        politica = tarefa.opcoes.get('duplicate_policy', self.politica_duplicados)
+        if politica not in POLITICAS_DUPLICADOS:
+            logger.warning(f"Política de duplicados desconhecida: {politica}. Usando 'skip'")
+            return "skip"
+        return politica
+    
+    def _pular_duplicado(self, registro, formato, tarefa):
+        """Conclui a tarefa usando o arquivo já existente, sem acessar a rede."""
+        logger.info(f"Vídeo já baixado, pulando: {registro['path']}")
+        success_info = {
+            'title': registro['title'],
+            'format': formato,
+            'path': registro['path'],
+            'duplicate': True,
+            'id_tarefa': tarefa.id,
+            'timings': dict(tarefa.tempos)
+        }
+        self.publicar('ao_sucesso', os.path.dirname(registro['path']), success_info)
+        return success_info
+    
+    def _reaplicar_metadados(self, url, registro, tarefa, duplicado=True):
+        """Atualiza as tags de um áudio já baixado sem baixar o arquivo de novo.
+
+        Com `duplicado=False` (arquivo de uma tarefa interrompida), o download
+        também é registrado no histórico.
+        """
+        try:
+            with tarefa.medir('extracao'):
+                info, _ = self._obter_info(None, url)
+            title = info.get('title', registro['title'])
             
-            self.sinal_progresso.emit(int(progress_float), info)
+            # Sem capa (save_thumbnails desligado), a capa já gravada no arquivo é mantida
+            aplicar_tags, salvar_capa = self._opcoes_tags(tarefa)
+            if aplicar_tags:
+                with tarefa.medir('thumbnail') as span:
+                    thumbnail_data = obter_capa(info) if salvar_capa else None
+                    span['bytes'] = len(thumbnail_data or b"")
+                with tarefa.medir('metadados'):
+                    aplicar_metadados(registro['path'], thumbnail_data=thumbnail_data, **montar_tags(info, url))
+            if not duplicado:
+                with tarefa.medir('historico'):
+                    adicionar_ao_historico(url, title, "audio", registro['path'])
+        except Exception as e:
+            error_msg = f"Erro ao atualizar metadados: {str(e)}"
+            logger.error(error_msg)
+            tarefa.erro = error_msg
+            self.publicar('ao_erro', error_msg, tarefa.id)
+            return None
+        
+        success_info = {
+            'title': title,
+            'format': os.path.splitext(registro['path'])[1][1:].lower(),
+            'path': registro['path'],
+            'has_metadata': aplicar_tags,
+            'duplicate': duplicado,
+            'id_tarefa': tarefa.id,
+            'timings': dict(tarefa.tempos)
+        }
+        self.publicar('ao_sucesso', os.path.dirname(registro['path']), success_info)
+        return success_info
+    
+    def _opcoes_tags(self, tarefa):
+        """(aplicar tags, incluir capa) conforme a tarefa ou o config.json."""
+        aplicar = tarefa.opcoes.get('apply_metadata', obter_valor_config("apply_metadata", True))
+        capa = tarefa.opcoes.get('save_thumbnails', obter_valor_config("save_thumbnails", True))
+        return bool(aplicar), bool(aplicar and capa)
+    
+    def _tags_para_conversao(self, tags, futuro_capa, tarefa):
+        """Entrega tags e capa ao FFmpeg no momento da conversão para MP3."""
+        with tarefa.medir('thumbnail') as span:
+            capa = futuro_capa.result() if futuro_capa else None
+            span['bytes'] = len(capa or b"")
+        return tags, capa
+    
+    def _caminho_final(self, info, caminho, nome_padrao):
+        """Caminho real do arquivo gerado, informado pelo yt-dlp após o download."""
+        downloads = info.get('requested_downloads') or []
+        if downloads and downloads[0].get('filepath'):
+            return downloads[0]['filepath']
+        return os.path.join(caminho, sanitizar_nome_arquivo(nome_padrao))
+    
+    def _opcoes_transferencia(self, tarefa):
+        """Opções do yt-dlp para a transferência: fragmentos simultâneos e downloader externo.
+
+        Os valores do config.json podem ser sobrescritos por tarefa, com as
+        opções "concurrent_fragments" e "external_downloader".
+        """
+        fragmentos = int(tarefa.opcoes.get('concurrent_fragments',
+                                           obter_valor_config("concurrent_fragments", 4)))
+        opcoes = {'concurrent_fragment_downloads': max(1, fragmentos)}
+        
+        externo = tarefa.opcoes.get('external_downloader', obter_valor_config("external_downloader", ""))
+        if externo == "aria2c":
+            if shutil.which("aria2c"):
+                conexoes = str(max(1, fragmentos))
+                opcoes['external_downloader'] = {'default': 'aria2c'}
+                opcoes['external_downloader_args'] = {
+                    'aria2c': ['-x', conexoes, '-s', conexoes, '-k', '1M']
+                }
+            else:
+                logger.warning("aria2c não encontrado. Usando o downloader interno do yt-dlp")
+                externo = ""
+        tarefa.transferencia = f"{externo or 'interno'}, {opcoes['concurrent_fragment_downloads']} fragmento(s)"
+        return opcoes
+    
+    def _vazao(self, tarefa):
+        """Vazão média da fase de download, em bytes por segundo."""
+        duracao = tarefa.tempos.get('download')
+        if not duracao or not tarefa.bytes_baixados:
+            return None
+        return tarefa.bytes_baixados / duracao
+    
+    def _registrar_tempos(self, tarefa):
+        tempos = ", ".join(f"{fase}={duracao:.2f}s" for fase, duracao in tarefa.tempos.items())
+        logger.info(f"Tempos da tarefa {tarefa.id}: {tempos}")
+        vazao = self._vazao(tarefa)
+        if vazao:
+            logger.info(f"Vazão da tarefa {tarefa.id}: {formatar_bytes(vazao)}/s "
+                        f"({formatar_bytes(tarefa.bytes_baixados)}; {tarefa.transferencia})")
     
     def cancelar_download(self):
-        """Cancela o download atual."""
-        self.deve_cancelar = True
+        """Cancela os downloads em andamento iniciados fora da fila.
+
+        Tarefas da fila são canceladas individualmente, com `fila.cancelar`.
+        """
+        with self._lock:
+            tarefas = list(self._tarefas_diretas)
+        for tarefa in tarefas:
+            tarefa.cancelar()
         logger.info("Download cancelado pelo usuário")
     
-    def baixar_audio(self, url, caminho, quality="320"):
-        """Baixa áudio de vídeo do YouTube."""
-        self.deve_cancelar = False
+    def baixar_audio(self, url, caminho, quality="320", tarefa=None):
+        """Baixa áudio de vídeo do YouTube. Retorna as informações do arquivo ou None."""
+        if tarefa is None:
+            tarefa = TarefaDownload(url, caminho, "audio", {"quality": quality})
         
-        is_valid, msg_or_url = validar_url_youtube(url)
+        self._registrar_tarefa(tarefa)
+        try:
+            return self._baixar_audio(url, caminho, quality, tarefa)
+        finally:
+            self._liberar_tarefa(tarefa)
+    
+    def _baixar_audio(self, url, caminho, quality, tarefa):
+        with tarefa.medir('validacao'):
+            is_valid, msg_or_url = validar_url_youtube(url)
         if not is_valid:
-            self.sinal_erro.emit(msg_or_url)
-            return
+            tarefa.erro = msg_or_url
+            self.publicar('ao_erro', msg_or_url, tarefa.id)
+            return None
         
         url = msg_or_url  # URL validada
         
+        formato_audio = tarefa.opcoes.get('audio_format', obter_valor_config("audio_format", "mp3"))
+        if formato_audio not in FORMATOS_AUDIO:
+            logger.warning(f"Formato de áudio desconhecido: {formato_audio}. Usando 'mp3'")
+            formato_audio = "mp3"
+        
+        # Consultar o histórico antes de qualquer acesso à rede
+        politica = self._politica_duplicados(tarefa)
+        if politica != "overwrite":
+            registro = self._buscar_duplicado(url, "audio", FORMATOS_AUDIO[formato_audio])
+            if registro:
+                # Com "apply_metadata" desligado, "retag" equivale a "skip"
+                aplicar_tags, _ = self._opcoes_tags(tarefa)
+                if politica == "retag" and aplicar_tags and registro['path'].lower().endswith(EXTENSOES_COM_TAGS):
+                    return self._reaplicar_metadados(url, registro, tarefa)
+                return self._pular_duplicado(registro, os.path.splitext(registro['path'])[1][1:].lower(), tarefa)
+        
+        # Tarefa retomada cujo áudio já estava pronto: só faltam tags e histórico
+        arquivo_baixado = tarefa.opcoes.get('arquivo_baixado')
+        if arquivo_baixado and os.path.exists(arquivo_baixado) and arquivo_baixado.lower().endswith(EXTENSOES_COM_TAGS):
+            registro = {'path': arquivo_baixado, 'title': os.path.splitext(os.path.basename(arquivo_baixado))[0]}
+            return self._reaplicar_metadados(url, registro, tarefa, duplicado=False)
+        
         if not os.path.isdir(caminho):
             try:
                 os.makedirs(caminho, exist_ok=True)
             except Exception as e:
                 error_msg = f"Não foi possível criar a pasta: {str(e)}"
                 logger.error(error_msg)
-                self.sinal_erro.emit(error_msg)
-                return
+                tarefa.erro = error_msg
+                self.publicar('ao_erro', error_msg, tarefa.id)
+                return None
         
+        # Formato e pós-processadores vêm do plano, feito após a extração
         ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': quality,
-            }],
             'outtmpl': os.path.join(caminho, '%(title)s.%(ext)s'),
             'quiet': True,
+            # O progresso é publicado pelos ganchos; sem as linhas "[download] xx%" no stderr
+            'noprogress': True,
             'no_warnings': True,
-            'progress_hooks': [self.gancho],
+            'noplaylist': True,
+            'progress_hooks': [partial(self.gancho, tarefa=tarefa)],
+            'overwrites': politica == "overwrite",
+            # Gravar em .part e continuar de onde parou se a tarefa for retomada
+            'continuedl': True,
+            'nopart': False,
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0',
                 'Accept-Language': 'pt-BR,pt;q=0.9'
             }
         }
         
-        # Configurar FFmpeg se disponível
-        if configurar_ffmpeg():
-            try:
-                import ffmpeg
-                # Para executáveis compilados, usar path absoluto
-                if getattr(sys, 'frozen', False):
-                    base_path = os.path.dirname(sys.executable)
-                    ffmpeg_path = os.path.join(base_path, '_internal', 'ffmpeg', 'bin', 'ffmpeg.exe')
-                    if os.path.exists(ffmpeg_path):
-                        ydl_opts['ffmpeg_location'] = ffmpeg_path
-                    else:
-                        # Fallback para biblioteca
-                        ydl_opts['prefer_ffmpeg'] = True
-                else:
-                    ydl_opts['prefer_ffmpeg'] = True
-            except Exception as e:
-                logger.warning(f"Erro ao configurar FFmpeg: {e}")
+        # FFmpeg localizado uma única vez por processo
+        ydl_opts.update(obter_localizador().opcoes_ytdlp())
+        ydl_opts.update(self._opcoes_transferencia(tarefa))
         
         try:
-            # Primeiro extrair informações
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'Unknown Title')
-                thumbnail = info.get('thumbnail')
-                
-                # Baixar thumbnail
-                thumbnail_data = None
-                if thumbnail:
-                    thumbnail_data = baixar_thumbnail(thumbnail)
+            # Extrair informações uma única vez; o mesmo info dict conduz o download
+            with tarefa.medir('extracao'):
+                info, do_cache = self._obter_info(None, url)
+            title = info.get('title', 'Unknown Title')
+            
+            # Caminho mais barato até o formato pedido (cópia, troca de contêiner ou recodificação)
+            plano = planejar_audio(info, formato_audio, quality, obter_localizador().possui_encoder)
+            ydl_opts['format'] = plano['format']
+            ydl_opts['postprocessors'] = plano['postprocessors']
+            
+            # Tags no formato do contêiner final, se habilitadas nas configurações
+            aplicar_tags, salvar_capa = self._opcoes_tags(tarefa)
+            tags = montar_tags(info, url) if aplicar_tags else None
+            
+            # Buscar a capa em paralelo ao download do áudio
+            futuro_capa = obter_capa_async(info) if salvar_capa and aplicar_tags else None
+            
+            # Na recodificação para MP3, tags e capa entram na mesma execução do FFmpeg
+            converter_com_tags = aplicar_tags and plano['ext'] == "mp3" and bool(plano['postprocessors'])
+            if converter_com_tags:
+                ydl_opts['postprocessors'] = []
+            
+            with obter_pool().emprestar_download(ydl_opts) as ydl:
+                extracao = None
+                if converter_com_tags:
+                    extracao = criar_extracao_com_tags(
+                        ydl, quality, partial(self._tags_para_conversao, tags, futuro_capa, tarefa)
+                    )
+                    ydl.add_post_processor(extracao)
                 
-                # Baixar áudio
-                if not self.deve_cancelar:
-                    ydl.download([url])
+                # Baixar áudio e, já fora da vaga de download, converter
+                if not tarefa.token.cancelado:
+                    self._processar_download(ydl, info, tarefa, url, do_cache)
+                    self._pos_processar(ydl, info, tarefa)
                     
                     # Caminho do arquivo baixado
-                    filename = sanitizar_nome_arquivo(f"{title}.mp3")
-                    file_path = os.path.join(caminho, filename)
+                    file_path = self._caminho_final(info, caminho, f"{title}.{plano['ext']}")
+                    diario.atualizar_etapa(tarefa.id, diario.ETAPA_BAIXADA, file_path)
                     
-                    # Extrair artista e aplicar metadados
-                    artist, song_title = extrair_artista_do_titulo(title)
-                    aplicar_metadados(file_path, song_title, artist, "YouTube Download", thumbnail_data)
+                    # Sem recodificação para MP3 (cópia direta, M4A ou Opus), gravar as tags com o mutagen
+                    if aplicar_tags and not (extracao and extracao.tags_gravadas):
+                        # Só o tempo de espera que sobrou após o download é contabilizado
+                        with tarefa.medir('thumbnail') as span:
+                            thumbnail_data = futuro_capa.result() if futuro_capa else None
+                            span['bytes'] = len(thumbnail_data or b"")
+                        with tarefa.medir('metadados'):
+                            aplicar_metadados(file_path, thumbnail_data=thumbnail_data, **tags)
                     
                     # Adicionar ao histórico
-                    adicionar_ao_historico(url, title, "audio", file_path)
+                    with tarefa.medir('historico'):
+                        adicionar_ao_historico(url, title, "audio", file_path)
+                    self._registrar_tempos(tarefa)
                     
-                    # Emitir sinal de sucesso com informações
+                    # Publicar evento de sucesso com informações
                     success_info = {
                         'title': title,
-                        'format': 'mp3',
+                        'format': plano['ext'],
                         'path': file_path,
-                        'has_metadata': True
+                        'has_metadata': aplicar_tags,
+                        'id_tarefa': tarefa.id,
+                        'timings': dict(tarefa.tempos),
+                        'throughput': self._vazao(tarefa)
                     }
-                    self.sinal_sucesso.emit(caminho, success_info)
+                    self.publicar('ao_sucesso', caminho, success_info)
+                    return success_info
         except Exception as e:
             error_msg = f"Erro ao baixar áudio: {str(e)}"
             logger.error(error_msg)
-            self.sinal_erro.emit(error_msg)
+            tarefa.erro = error_msg
+            self.publicar('ao_erro', error_msg, tarefa.id)
+        return None
     
-    def baixar_video(self, url, caminho, format="mp4", quality="720p"):
-        """Baixa vídeo do YouTube."""
-        self.deve_cancelar = False
+    def baixar_video(self, url, caminho, format="mp4", quality="720p", tarefa=None):
+        """Baixa vídeo do YouTube. Retorna as informações do arquivo ou None."""
+        if tarefa is None:
+            tarefa = TarefaDownload(url, caminho, "video", {"format": format, "quality": quality})
         
-        is_valid, msg_or_url = validar_url_youtube(url)
+        self._registrar_tarefa(tarefa)
+        try:
+            return self._baixar_video(url, caminho, format, quality, tarefa)
+        finally:
+            self._liberar_tarefa(tarefa)
+    
+    def _baixar_video(self, url, caminho, format, quality, tarefa):
+        with tarefa.medir('validacao'):
+            is_valid, msg_or_url = validar_url_youtube(url)
         if not is_valid:
-            self.sinal_erro.emit(msg_or_url)
-            return
+            tarefa.erro = msg_or_url
+            self.publicar('ao_erro', msg_or_url, tarefa.id)
+            return None
         
         url = msg_or_url  # URL validada
         
+        # Consultar o histórico antes de qualquer acesso à rede. Para vídeos,
+        # "retag" equivale a "skip"
+        politica = self._politica_duplicados(tarefa)
+        if politica != "overwrite":
+            registro = self._buscar_duplicado(url, "video", "." + format.lower())
+            if registro:
+                return self._pular_duplicado(registro, format.lower(), tarefa)
+        
+        # Tarefa retomada cujo vídeo já estava pronto: só falta o histórico
+        arquivo_baixado = tarefa.opcoes.get('arquivo_baixado')
+        if arquivo_baixado and os.path.exists(arquivo_baixado):
+            title = os.path.splitext(os.path.basename(arquivo_baixado))[0]
+            adicionar_ao_historico(url, title, "video", arquivo_baixado)
+            success_info = {
+                'title': title,
+                'format': format.lower(),
+                'path': arquivo_baixado,
+                'quality': quality,
+                'id_tarefa': tarefa.id,
+                'timings': dict(tarefa.tempos)
+            }
+            self.publicar('ao_sucesso', caminho, success_info)
+            return success_info
+        
         if not os.path.isdir(caminho):
             try:
                 os.makedirs(caminho, exist_ok=True)
             except Exception as e:
                 error_msg = f"Não foi possível criar a pasta: {str(e)}"
                 logger.error(error_msg)
-                self.sinal_erro.emit(error_msg)
-                return
-        
-        # Mapear qualidade para formato yt-dlp com codecs específicos
-        format_map = {
-            "360p": "bestvideo[height<=360][vcodec^=avc]+bestaudio[acodec^=mp4a]/best[height<=360][ext=mp4]",
-            "480p": "bestvideo[height<=480][vcodec^=avc]+bestaudio[acodec^=mp4a]/best[height<=480][ext=mp4]",
-            "720p": "bestvideo[height<=720][vcodec^=avc]+bestaudio[acodec^=mp4a]/best[height<=720][ext=mp4]",
-            "1080p": "bestvideo[height<=1080][vcodec^=avc]+bestaudio[acodec^=mp4a]/best[height<=1080][ext=mp4]"
-        }
-        
-        format_string = format_map.get(quality, "bestvideo[vcodec^=avc]+bestaudio[acodec^=mp4a]/best[ext=mp4]")
+                tarefa.erro = error_msg
+                self.publicar('ao_erro', error_msg, tarefa.id)
+                return None
         
+        # Formato, contêiner e pós-processadores vêm do plano, feito após a extração
         ydl_opts = {
-            'format': format_string,
-            'merge_output_format': format.lower(),
             'outtmpl': os.path.join(caminho, '%(title)s.%(ext)s'),
             'quiet': True,
+            # O progresso é publicado pelos ganchos; sem as linhas "[download] xx%" no stderr
+            'noprogress': True,
             'no_warnings': True,
-            'progress_hooks': [self.gancho],
+            'noplaylist': True,
+            'progress_hooks': [partial(self.gancho, tarefa=tarefa)],
+            'overwrites': politica == "overwrite",
+            # Gravar em .part e continuar de onde parou se a tarefa for retomada
+            'continuedl': True,
+            'nopart': False,
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0',
                 'Accept-Language': 'pt-BR,pt;q=0.9'
-            },
-            # Forçar remuxagem para garantir compatibilidade
-            'postprocessors': [{
-                'key': 'FFmpegVideoRemuxer',
-                'preferedformat': format.lower(),
-            }]
+            }
         }
         
-        # Configurar FFmpeg se disponível
-        if configurar_ffmpeg():
-            try:
-                import ffmpeg
-                # Para executáveis compilados, usar path absoluto
-                if getattr(sys, 'frozen', False):
-                    base_path = os.path.dirname(sys.executable)
-                    ffmpeg_path = os.path.join(base_path, '_internal', 'ffmpeg', 'bin', 'ffmpeg.exe')
-                    if os.path.exists(ffmpeg_path):
-                        ydl_opts['ffmpeg_location'] = ffmpeg_path
-                    else:
-                        # Fallback para biblioteca
-                        ydl_opts['prefer_ffmpeg'] = True
-                else:
-                    ydl_opts['prefer_ffmpeg'] = True
-            except Exception as e:
-                logger.warning(f"Erro ao configurar FFmpeg: {e}")
+        # FFmpeg localizado uma única vez por processo
+        ydl_opts.update(obter_localizador().opcoes_ytdlp())
+        ydl_opts.update(self._opcoes_transferencia(tarefa))
         
         try:
-            # Primeiro extrair informações
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'Unknown Title')
-                
-                # Baixar vídeo
-                if not self.deve_cancelar:
-                    ydl.download([url])
+            # Extrair informações uma única vez; o mesmo info dict conduz o download
+            with tarefa.medir('extracao'):
+                info, do_cache = self._obter_info(None, url)
+            title = info.get('title', 'Unknown Title')
+            
+            # Streams que o contêiner aceita como estão; remuxar só em último caso
+            plano = planejar_video(info, format.lower(), quality)
+            for chave in ('format', 'merge_output_format', 'postprocessors'):
+                ydl_opts[chave] = plano[chave]
+            
+            with obter_pool().emprestar_download(ydl_opts) as ydl:
+                # Baixar vídeo e, já fora da vaga de download, unir/remuxar
+                if not tarefa.token.cancelado:
+                    self._processar_download(ydl, info, tarefa, url, do_cache)
+                    self._pos_processar(ydl, info, tarefa)
                     
                     # Caminho do arquivo baixado
-                    filename = sanitizar_nome_arquivo(f"{title}.{format.lower()}")
-                    file_path = os.path.join(caminho, filename)
+                    file_path = self._caminho_final(info, caminho, f"{title}.{format.lower()}")
+                    diario.atualizar_etapa(tarefa.id, diario.ETAPA_BAIXADA, file_path)
                     
                     # Adicionar ao histórico
-                    adicionar_ao_historico(url, title, "video", file_path)
+                    with tarefa.medir('historico'):
+                        adicionar_ao_historico(url, title, "video", file_path)
+                    self._registrar_tempos(tarefa)
                     
-                    # Emitir sinal de sucesso com informações
+                    # Publicar evento de sucesso com informações
                     success_info = {
                         'title': title,
                         'format': format.lower(),
                         'path': file_path,
-                        'quality': quality
+                        'quality': quality,
+                        'id_tarefa': tarefa.id,
+                        'timings': dict(tarefa.tempos),
+                        'throughput': self._vazao(tarefa)
                     }
-                    self.sinal_sucesso.emit(caminho, success_info)
+                    self.publicar('ao_sucesso', caminho, success_info)
+                    return success_info
         except Exception as e:
             error_msg = f"Erro ao baixar vídeo: {str(e)}"
             logger.error(error_msg)
-            self.sinal_erro.emit(error_msg)
+            tarefa.erro = error_msg
+            self.publicar('ao_erro', error_msg, tarefa.id)
+        return None
 
 # Função de compatibilidade com a versão anterior
 def baixar_audio(url, caminho, progress_callback=None):
     """Função de compatibilidade para versões anteriores."""
     gerenciador = GerenciadorDownload()
     if progress_callback:
-        gerenciador.sinal_progresso.connect(
-            lambda value, _: progress_callback.emit(value)
-        )
+        gerenciador.adicionar_ouvinte(OuvinteCallbacks(
+            ao_progresso=lambda value, _: progress_callback.emit(value)
+        ))
     gerenciador.baixar_audio(url, caminho)
\ No newline at end of file
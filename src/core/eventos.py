@@ -0,0 +1,85 @@
+import threading
+from src.utils.helpers import logger
+
+class OuvinteDownload:
+    """Interface de observador dos eventos do motor de download.
+
+    Subclasses sobrescrevem apenas os eventos que interessam. Os métodos são
+    chamados diretamente na thread que executa o download.
+    """
+
+    def ao_info(self, info):
+        """Informações do vídeo foram extraídas."""
+
+    def ao_progresso(self, progresso, info):
+        """Progresso (0-100) de uma tarefa; `info` traz velocidade, ETA e `id_tarefa`."""
+
+    def ao_progresso_lote(self, estados):
+        """Estados de progresso alterados desde a última publicação, um por tarefa."""
+
+    def ao_sucesso(self, caminho, info):
+        """Download concluído; `info` traz título, formato, caminho e `id_tarefa`."""
+
+    def ao_erro(self, mensagem, id_tarefa=None):
+        """Falha ao extrair ou baixar."""
+
+class OuvinteCallbacks(OuvinteDownload):
+    """Adapta funções avulsas para a interface OuvinteDownload."""
+
+    def __init__(self, ao_info=None, ao_progresso=None, ao_sucesso=None, ao_erro=None,
+                 ao_progresso_lote=None):
+        self._callbacks = {
+            'ao_info': ao_info,
+            'ao_progresso': ao_progresso,
+            'ao_progresso_lote': ao_progresso_lote,
+            'ao_sucesso': ao_sucesso,
+            'ao_erro': ao_erro,
+        }
+
+    def ao_info(self, info):
+        if self._callbacks['ao_info']:
+            self._callbacks['ao_info'](info)
+
+    def ao_progresso(self, progresso, info):
+        if self._callbacks['ao_progresso']:
+            self._callbacks['ao_progresso'](progresso, info)
+
+    def ao_progresso_lote(self, estados):
+        if self._callbacks['ao_progresso_lote']:
+            self._callbacks['ao_progresso_lote'](estados)
+
+    def ao_sucesso(self, caminho, info):
+        if self._callbacks['ao_sucesso']:
+            self._callbacks['ao_sucesso'](caminho, info)
+
+    def ao_erro(self, mensagem, id_tarefa=None):
+        if self._callbacks['ao_erro']:
+            self._callbacks['ao_erro'](mensagem, id_tarefa)
+
+class PublicadorEventos:
+    """Mantém a lista de ouvintes e distribui os eventos para cada um."""
+
+    def __init__(self):
+        self._ouvintes = []
+        self._lock_ouvintes = threading.Lock()
+
+    def adicionar_ouvinte(self, ouvinte):
+        with self._lock_ouvintes:
+            if ouvinte not in self._ouvintes:
+                self._ouvintes.append(ouvinte)
+
+    def remover_ouvinte(self, ouvinte):
+        with self._lock_ouvintes:
+            if ouvinte in self._ouvintes:
+                self._ouvintes.remove(ouvinte)
+
+    def publicar(self, evento, *args):
+        """Chama o método `evento` em todos os ouvintes registrados."""
+        # Copiar a lista permite que ouvintes se removam durante a notificação
+        with self._lock_ouvintes:
+            ouvintes = list(self._ouvintes)
+        for ouvinte in ouvintes:
+            try:
+                getattr(ouvinte, evento)(*args)
+            except Exception as e:
+                logger.error(f"Erro no ouvinte {type(ouvinte).__name__}.{evento}: {str(e)}")
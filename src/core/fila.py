@@ -0,0 +1,218 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from src.utils.helpers import logger
+from src.core import diario
+from src.core.metricas import obter_metricas
+
+# Estados possíveis de uma tarefa
+ESTADO_PENDENTE = "pendente"
+ESTADO_EM_ANDAMENTO = "em_andamento"
+ESTADO_CONCLUIDO = "concluido"
+ESTADO_FALHOU = "falhou"
+ESTADO_CANCELADO = "cancelado"
+
+ESTADOS_FINAIS = (ESTADO_CONCLUIDO, ESTADO_FALHOU, ESTADO_CANCELADO)
+
+class TokenCancelamento:
+    """Sinaliza o cancelamento de uma única tarefa de download."""
+
+    def __init__(self):
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        self._evento.set()
+
+    @property
+    def cancelado(self):
+        return self._evento.is_set()
+
+class TarefaDownload:
+    """Representa um item da fila de downloads e seu estado."""
+
+    def __init__(self, url, caminho, tipo="audio", opcoes=None, prioridade=0, id_tarefa=None):
+        # Tarefas retomadas mantêm o ID com que estão no diário
+        self.id = id_tarefa or uuid.uuid4().hex[:8]
+        self.url = url
+        self.caminho = caminho
+        self.tipo = tipo  # "audio" ou "video"
+        self.opcoes = dict(opcoes or {})
+        self.prioridade = prioridade
+        self.estado = ESTADO_PENDENTE
+        self.progresso = 0
+        self.erro = None
+        self.resultado = None
+        self.tempos = {}  # fase -> segundos
+        self.bytes_baixados = 0
+        self.transferencia = None  # Descrição do modo de transferência usado
+        self.banda_alocada = None  # bytes/s reservados pelo limitador (None = sem limite)
+        self.banda_obtida = None  # bytes/s efetivamente recebidos
+        self.token = TokenCancelamento()
+        self.concluida = threading.Event()
+
+    def cancelar(self):
+        """Solicita o cancelamento da tarefa."""
+        self.token.cancelar()
+
+    @contextmanager
+    def medir(self, fase):
+        """Acumula o tempo gasto em uma fase da tarefa e o registra como span.
+
+        O dict entregue pelo `with` recebe atributos do span (ex.: "bytes").
+        """
+        atributos = {}
+        inicio_relogio = time.time()
+        inicio = time.perf_counter()
+        try:
+            yield atributos
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.tempos[fase] = self.tempos.get(fase, 0) + duracao
+            obter_metricas().registrar_span(fase, inicio_relogio, duracao, self.id, **atributos)
+
+    @property
+    def finalizada(self):
+        return self.estado in ESTADOS_FINAIS
+
+    def __repr__(self):
+        return f"<TarefaDownload {self.id} {self.tipo} {self.estado} {self.url}>"
+
+class FilaDownload:
+    """Fila de downloads com prioridade processada por um pool de threads."""
+
+    def __init__(self, gerenciador, max_simultaneos=3):
+        self.gerenciador = gerenciador
+        self.max_simultaneos = max(1, int(max_simultaneos))
+        self._fila = queue.PriorityQueue()
+        self._contador = itertools.count()
+        self._tarefas = {}
+        self._workers = []
+        self._lock = threading.Lock()
+        self._encerrada = False
+
+    def adicionar(self, url, caminho, tipo="audio", prioridade=0, id_tarefa=None, **opcoes):
+        """Enfileira um download. Maior prioridade é processada primeiro."""
+        if self._encerrada:
+            raise RuntimeError("A fila de downloads já foi encerrada")
+
+        tarefa = TarefaDownload(url, caminho, tipo, opcoes, prioridade, id_tarefa)
+        with self._lock:
+            self._tarefas[tarefa.id] = tarefa
+
+        # Gravar antes de entrar na fila, para não sobrescrever a etapa do worker.
+        # Uma tarefa retomada assume a própria entrada do diário na mesma gravação
+        diario.registrar_tarefa(tarefa, diario.ETAPA_ENFILEIRADA)
+        self._fila.put((-prioridade, next(self._contador), tarefa))
+        self._iniciar_workers()
+        logger.info(f"Tarefa {tarefa.id} enfileirada: {url}")
+        return tarefa
+
+    def _iniciar_workers(self):
+        """Cria as threads de trabalho sob demanda, até o limite configurado."""
+        with self._lock:
+            while len(self._workers) < self.max_simultaneos:
+                worker = threading.Thread(
+                    target=self._executar_worker,
+                    name=f"download-worker-{len(self._workers) + 1}",
+                    daemon=True
+                )
+                self._workers.append(worker)
+                worker.start()
+
+    def _executar_worker(self):
+        while True:
+            _, _, tarefa = self._fila.get()
+            try:
+                if tarefa is None:
+                    break
+                self._processar(tarefa)
+            except Exception as e:
+                logger.error(f"Erro inesperado na tarefa {tarefa.id}: {str(e)}")
+                tarefa.erro = str(e)
+                tarefa.estado = ESTADO_FALHOU
+                tarefa.concluida.set()
+            finally:
+                self._fila.task_done()
+
+    def _processar(self, tarefa):
+        """Executa uma tarefa usando o gerenciador de download."""
+        if tarefa.token.cancelado:
+            # Continua no diário: pode ser retomada depois
+            tarefa.estado = ESTADO_CANCELADO
+            tarefa.concluida.set()
+            return
+
+        tarefa.estado = ESTADO_EM_ANDAMENTO
+        if tarefa.tipo == "audio":
+            resultado = self.gerenciador.baixar_audio(
+                tarefa.url, tarefa.caminho,
+                tarefa.opcoes.get("quality", "320"),
+                tarefa=tarefa
+            )
+        else:
+            resultado = self.gerenciador.baixar_video(
+                tarefa.url, tarefa.caminho,
+                tarefa.opcoes.get("format", "mp4"),
+                tarefa.opcoes.get("quality", "720p"),
+                tarefa=tarefa
+            )
+
+        tarefa.resultado = resultado
+        if resultado is not None:
+            tarefa.estado = ESTADO_CONCLUIDO
+        elif tarefa.token.cancelado:
+            tarefa.estado = ESTADO_CANCELADO
+        else:
+            tarefa.estado = ESTADO_FALHOU
+        tarefa.concluida.set()
+
+    def obter(self, id_tarefa):
+        """Retorna a tarefa com o ID informado."""
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def listar(self, estado=None):
+        """Lista as tarefas na ordem em que foram enfileiradas."""
+        with self._lock:
+            tarefas = list(self._tarefas.values())
+        if estado:
+            tarefas = [t for t in tarefas if t.estado == estado]
+        return tarefas
+
+    def cancelar(self, id_tarefa):
+        """Cancela uma tarefa pendente ou em andamento."""
+        tarefa = self.obter(id_tarefa)
+        if not tarefa or tarefa.finalizada:
+            return False
+        tarefa.cancelar()
+        logger.info(f"Tarefa {id_tarefa} cancelada pelo usuário")
+        return True
+
+    def cancelar_todos(self):
+        """Cancela todas as tarefas que ainda não terminaram."""
+        for tarefa in self.listar():
+            if not tarefa.finalizada:
+                tarefa.cancelar()
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até que todas as tarefas enfileiradas terminem."""
+        for tarefa in self.listar():
+            if not tarefa.concluida.wait(timeout):
+                return False
+        return True
+
+    def encerrar(self, cancelar=False):
+        """Encerra as threads de trabalho após esvaziar a fila."""
+        if cancelar:
+            self.cancelar_todos()
+        self._encerrada = True
+        with self._lock:
+            workers = list(self._workers)
+        for _ in workers:
+            # Sentinelas vão para o fim da fila
+            self._fila.put((float("inf"), next(self._contador), None))
+        for worker in workers:
+            worker.join()
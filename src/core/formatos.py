@@ -0,0 +1,179 @@
+import re
+from src.utils.helpers import logger
+
+# Formatos de áudio de saída aceitos e as extensões que cada um pode gerar
+FORMATOS_AUDIO = {
+    "mp3": (".mp3",),
+    "m4a": (".m4a",),
+    "opus": (".opus",),
+    "original": (".m4a", ".opus"),  # Mantém o codec da fonte
+}
+
+# Encoder do FFmpeg necessário para recodificar o áudio em cada formato
+ENCODERS_AUDIO = {"mp3": "libmp3lame", "m4a": "aac", "opus": "libopus"}
+
+# Qualidades nomeadas pela resolução horizontal ("4K") e a altura correspondente
+ALTURAS_NOMEADAS = {"2k": 1440, "4k": 2160, "8k": 4320}
+
+# Codecs que cada contêiner de vídeo aceita sem recodificar
+CODECS_CONTEINER = {
+    "mp4": {"video": ("avc1", "h264"), "audio": ("mp4a",)},
+    "mkv": None,  # Aceita qualquer codec
+}
+
+def _codec(formato, tipo):
+    codec = (formato.get(tipo) or "none").lower()
+    return None if codec == "none" else codec
+
+def _separar(formatos):
+    """Divide os formatos utilizáveis em somente vídeo, somente áudio e combinados.
+
+    Formatos com DRM ficam de fora: servem só para decidir o caminho do
+    plano, pois a escolha final é do ordenador de formatos do yt-dlp.
+    """
+    videos, audios, combinados = [], [], []
+    for f in formatos:
+        if not f.get("format_id") or f.get("has_drm"):
+            continue
+        video, audio = _codec(f, "vcodec"), _codec(f, "acodec")
+        if video and audio:
+            combinados.append(f)
+        elif video:
+            videos.append(f)
+        elif audio:
+            audios.append(f)
+    return videos, audios, combinados
+
+def _aceita(codec, prefixos):
+    return prefixos is None or any(codec.startswith(p) for p in prefixos)
+
+def _filtros(campo, prefixos):
+    """Filtros do seletor do yt-dlp para os prefixos de codec ("" = qualquer codec)."""
+    return [f"[{campo}^={p}]" for p in prefixos] if prefixos else [""]
+
+def _altura_max(formatos):
+    return max((f.get("height") or 0 for f in formatos), default=0)
+
+def _altura_pedida(qualidade):
+    """Altura máxima da qualidade ("720", "1080p", "1080p60", "4K").
+
+    Retorna None (sem limite de altura) para "best" ou valores não reconhecidos.
+    """
+    texto = str(qualidade or "").strip().lower()
+    if texto in ALTURAS_NOMEADAS:
+        return ALTURAS_NOMEADAS[texto]
+    correspondencia = re.match(r"(\d+)p?", texto)
+    if correspondencia and int(correspondencia.group(1)) > 0:
+        return int(correspondencia.group(1))
+    if texto not in ("", "best", "0"):
+        logger.warning(f"Qualidade de vídeo não reconhecida: {qualidade}; sem limite de altura")
+    return None
+
+def planejar_audio(info, formato, qualidade, possui_encoder=None):
+    """Escolhe o caminho mais barato até o áudio no formato pedido.
+
+    Cópia direta quando a fonte já está no formato, cópia de stream para o
+    contêiner .opus, e só recodifica (FFmpegExtractAudio) quando necessário.
+    O plano decide o caminho pelos codecs disponíveis, mas entrega ao yt-dlp
+    seletores ("bestaudio[acodec^=mp4a]"), e não IDs de formato: o ordenador
+    do yt-dlp continua evitando faixas dubladas, variantes DRC e formatos
+    marcados como defeituosos. Retorna um dict com as opções do yt-dlp
+    ("format", "postprocessors"), a extensão final ("ext") e o motivo.
+
+    `possui_encoder(nome)` informa se o FFmpeg tem o encoder da recodificação;
+    sem ele, o AAC original é mantido, ou ValueError é levantado se não houver
+    AAC para copiar.
+    """
+    _, audios, _ = _separar(info.get("formats") or [])
+    if formato == "original":
+        # O YouTube oferece Opus (WebM) e AAC (M4A); nenhum dos dois é recodificado
+        formato = "opus" if any(_codec(f, "acodec").startswith("opus") for f in audios) else "m4a"
+
+    prefixo = {"mp3": "mp3", "m4a": "mp4a", "opus": "opus"}[formato]
+    disponivel = any(_codec(f, "acodec").startswith(prefixo) for f in audios)
+
+    if disponivel and formato != "opus":
+        # O arquivo baixado já é o final: nenhum processamento
+        plano = {
+            "format": f"bestaudio[acodec^={prefixo}]",
+            "postprocessors": [],
+            "ext": formato,
+            "motivo": f"áudio em {formato} disponível; cópia direta",
+        }
+    elif disponivel:
+        # Opus vem em WebM; trocar o contêiner sem recodificar
+        plano = {
+            "format": "bestaudio[acodec^=opus]",
+            "postprocessors": [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'opus'}],
+            "ext": "opus",
+            "motivo": "áudio Opus disponível; cópia de stream para .opus",
+        }
+    elif possui_encoder is not None and not possui_encoder(ENCODERS_AUDIO[formato]):
+        encoder = ENCODERS_AUDIO[formato]
+        if not any(_codec(f, "acodec").startswith("mp4a") for f in audios):
+            raise ValueError(f"O FFmpeg não tem o encoder {encoder}, necessário para converter para {formato}")
+        logger.warning(f"FFmpeg sem o encoder {encoder}; mantendo o áudio AAC original")
+        plano = {
+            "format": "bestaudio[acodec^=mp4a]",
+            "postprocessors": [],
+            "ext": "m4a",
+            "motivo": f"FFmpeg sem o encoder {encoder}; cópia direta do áudio AAC",
+        }
+    else:
+        plano = {
+            "format": "bestaudio/best",
+            "postprocessors": [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': formato,
+                'preferredquality': qualidade,
+            }],
+            "ext": formato,
+            "motivo": f"nenhum áudio em {formato} disponível; recodificação necessária",
+        }
+    logger.info(f"Plano de áudio para {info.get('id')}: {plano['motivo']}")
+    return plano
+
+def planejar_video(info, conteiner, qualidade):
+    """Escolhe streams que o contêiner aceite como estão, evitando recodificar ou remuxar.
+
+    Preferência: vídeo + áudio compatíveis unidos por cópia de stream; um
+    formato combinado já no contêiner; e, por último, a seleção genérica
+    seguida de remuxagem (comportamento anterior). Como no áudio, o plano
+    entrega seletores com filtros de codec e altura ao yt-dlp.
+    """
+    altura_max = _altura_pedida(qualidade) or 100000
+    codecs = CODECS_CONTEINER.get(conteiner)
+    videos, audios, combinados = _separar(info.get("formats") or [])
+    altura = f"[height<={altura_max}]" if altura_max < 100000 else ""
+
+    videos = [f for f in videos
+              if _aceita(_codec(f, "vcodec"), codecs and codecs["video"]) and (f.get("height") or 0) <= altura_max]
+    audios = [f for f in audios if _aceita(_codec(f, "acodec"), codecs and codecs["audio"])]
+    combinados = [f for f in combinados if f.get("ext") == conteiner and (f.get("height") or 0) <= altura_max]
+
+    if videos and audios and (not combinados or _altura_max(videos) >= _altura_max(combinados)):
+        seletores = [
+            f"bestvideo{filtro_video}{altura}+bestaudio{filtro_audio}"
+            for filtro_video in _filtros("vcodec", codecs and codecs["video"])
+            for filtro_audio in _filtros("acodec", codecs and codecs["audio"])
+        ]
+        plano = {
+            "format": "/".join(seletores),
+            "postprocessors": [],
+            "motivo": f"vídeo e áudio compatíveis com {conteiner}; unidos sem recodificar",
+        }
+    elif combinados:
+        plano = {
+            "format": f"best[ext={conteiner}]{altura}",
+            "postprocessors": [],
+            "motivo": f"formato combinado já em {conteiner}; cópia direta",
+        }
+    else:
+        plano = {
+            "format": f"bestvideo{altura}+bestaudio/best{altura}",
+            "postprocessors": [{'key': 'FFmpegVideoRemuxer', 'preferedformat': conteiner}],
+            "motivo": f"nenhum stream compatível com {conteiner}; remuxagem após o download",
+        }
+    plano["merge_output_format"] = conteiner
+    logger.info(f"Plano de vídeo para {info.get('id')}: {plano['motivo']}")
+    return plano
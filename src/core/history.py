@@ -1,59 +1,143 @@
 import json
 import os
-from datetime import datetime
-from src.utils.helpers import logger
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from src.utils.helpers import logger, extrair_id_video
+from src.config.config import obter_valor_config
 
-ARQUIVO_HISTORICO = "download_history.json"
+ARQUIVO_HISTORICO_DB = "download_history.db"
+ARQUIVO_HISTORICO = "download_history.json"  # Formato antigo, migrado para o SQLite
 
-def carregar_historico():
-    """Carrega o histórico de downloads."""
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    video_id TEXT,
+    title TEXT,
+    format TEXT,
+    path TEXT,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_video_id ON downloads (video_id, format);
+CREATE INDEX IF NOT EXISTS idx_downloads_url ON downloads (url);
+CREATE INDEX IF NOT EXISTS idx_downloads_date ON downloads (date);
+CREATE INDEX IF NOT EXISTS idx_downloads_format ON downloads (format);
+"""
+
+# Uma conexão compartilhada; downloads simultâneos gravam sob o lock
+_lock_historico = threading.Lock()
+_conexao = None
+
+def _obter_conexao():
+    """Abre o banco na primeira utilização, criando o esquema e migrando o JSON."""
+    global _conexao
+    if _conexao is None:
+        _conexao = sqlite3.connect(ARQUIVO_HISTORICO_DB, check_same_thread=False)
+        _conexao.row_factory = sqlite3.Row
+        _conexao.execute("PRAGMA journal_mode=WAL")
+        _conexao.executescript(ESQUEMA)
+        _migrar_json(_conexao)
+        # Retenção é ilimitada por padrão; a poda só ocorre se configurada
+        _podar(_conexao, obter_valor_config("history_max_entries", 0),
+               obter_valor_config("history_retention_days", 0))
+    return _conexao
+
+def _migrar_json(conexao):
+    """Importa o download_history.json antigo, se existir, e o renomeia."""
+    if not os.path.exists(ARQUIVO_HISTORICO):
+        return
     try:
-        if os.path.exists(ARQUIVO_HISTORICO):
-            with open(ARQUIVO_HISTORICO, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {"downloads": []}
+        with open(ARQUIVO_HISTORICO, "r", encoding="utf-8") as f:
+            downloads = json.load(f).get("downloads", [])
+
+        # O JSON guarda o mais recente primeiro; inserir do mais antigo
+        with conexao:
+            conexao.executemany(
+                "INSERT INTO downloads (url, video_id, title, format, path, date) VALUES (?, ?, ?, ?, ?, ?)",
+                [(d.get("url", ""), extrair_id_video(d.get("url", "")), d.get("title"),
+                  d.get("format"), d.get("path"), d.get("date", ""))
+                 for d in reversed(downloads)]
+            )
+        os.replace(ARQUIVO_HISTORICO, ARQUIVO_HISTORICO + ".bak")
+        logger.info(f"{len(downloads)} registros migrados de {ARQUIVO_HISTORICO} para {ARQUIVO_HISTORICO_DB}")
     except Exception as e:
-        logger.error(f"Erro ao carregar histórico: {str(e)}")
-        return {"downloads": []}
+        logger.error(f"Erro ao migrar histórico JSON: {str(e)}")
 
-def salvar_historico(history_data):
-    """Salva o histórico de downloads."""
+def _executar(sql, parametros=()):
+    with _lock_historico:
+        conexao = _obter_conexao()
+        with conexao:
+            return conexao.execute(sql, parametros).fetchall()
+
+def adicionar_ao_historico(url, title, format_type, file_path):
+    """Adiciona um download ao histórico."""
     try:
-        with open(ARQUIVO_HISTORICO, "w", encoding="utf-8") as f:
-            json.dump(history_data, f, indent=2)
+        _executar(
+            "INSERT INTO downloads (url, video_id, title, format, path, date) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, extrair_id_video(url), title, format_type, file_path,
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
         return True
     except Exception as e:
         logger.error(f"Erro ao salvar histórico: {str(e)}")
         return False
 
-def adicionar_ao_historico(url, title, format_type, file_path):
-    """Adiciona um download ao histórico."""
-    historico = carregar_historico()
-    
-    # Criar novo registro
-    novo_registro = {
-        "url": url,
-        "title": title,
-        "format": format_type,  # "audio" ou "video"
-        "path": file_path,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    
-    # Adicionar ao início da lista (mais recente primeiro)
-    historico["downloads"].insert(0, novo_registro)
-    
-    # Limitar o histórico a 100 itens
-    if len(historico["downloads"]) > 100:
-        historico["downloads"] = historico["downloads"][:100]
-    
-    # Salvar histórico atualizado
-    return salvar_historico(historico)
+def carregar_historico():
+    """Carrega todo o histórico no formato antigo ({"downloads": [...]})."""
+    return {"downloads": obter_downloads_recentes(limit=None)}
 
 def limpar_historico():
     """Limpa todo o histórico de downloads."""
-    return salvar_historico({"downloads": []})
+    try:
+        _executar("DELETE FROM downloads")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao limpar histórico: {str(e)}")
+        return False
+
+def _podar(conexao, max_registros, dias):
+    with conexao:
+        if dias:
+            limite = (datetime.now() - timedelta(days=dias)).strftime("%Y-%m-%d %H:%M:%S")
+            conexao.execute("DELETE FROM downloads WHERE date < ?", (limite,))
+        if max_registros:
+            conexao.execute(
+                "DELETE FROM downloads WHERE id NOT IN "
+                "(SELECT id FROM downloads ORDER BY date DESC, id DESC LIMIT ?)",
+                (max_registros,)
+            )
 
 def obter_downloads_recentes(limit=10):
-    """Retorna os downloads mais recentes."""
-    historico = carregar_historico()
-    return historico["downloads"][:limit]
+    """Retorna os downloads mais recentes (todos, se `limit` for None)."""
+    try:
+        linhas = _executar(
+            "SELECT url, title, format, path, date FROM downloads "
+            "ORDER BY date DESC, id DESC LIMIT ?",
+            (-1 if limit is None else limit,)
+        )
+        return [dict(linha) for linha in linhas]
+    except Exception as e:
+        logger.error(f"Erro ao carregar histórico: {str(e)}")
+        return []
+
+def buscar_downloads(url, format_type=None):
+    """Lista, do mais recente ao mais antigo, os downloads anteriores do mesmo vídeo.
+
+    A busca usa o ID canônico do vídeo, então youtu.be, watch?v= e m.youtube
+    apontam para os mesmos registros.
+    """
+    id_video = extrair_id_video(url)
+    try:
+        if id_video:
+            sql, parametros = "SELECT url, title, format, path, date FROM downloads WHERE video_id = ?", [id_video]
+        else:
+            sql, parametros = "SELECT url, title, format, path, date FROM downloads WHERE url = ?", [url]
+        if format_type:
+            sql += " AND format = ?"
+            parametros.append(format_type)
+        linhas = _executar(sql + " ORDER BY date DESC, id DESC", parametros)
+        return [dict(linha) for linha in linhas]
+    except Exception as e:
+        logger.error(f"Erro ao consultar histórico: {str(e)}")
+        return []
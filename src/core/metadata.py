@@ -1,81 +1,174 @@
 import os
-import requests
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB
-from mutagen.mp3 import MP3
-from PIL import Image
-import io
+import tempfile
 from src.utils.helpers import logger
+from src.core.capas import baixar_imagem, processar_capa, configuracao_capa
+
+ALBUM_PADRAO = "YouTube Download"
 
 def baixar_thumbnail(thumbnail_url):
     """Baixa a thumbnail do vídeo."""
-    try:
-        response = requests.get(thumbnail_url, stream=True)
-        if response.status_code == 200:
-            return response.content
-        else:
-            logger.warning(f"Não foi possível baixar a thumbnail: HTTP {response.status_code}")
-            return None
-    except Exception as e:
-        logger.error(f"Erro ao baixar thumbnail: {str(e)}")
-        return None
+    return baixar_imagem(thumbnail_url)
+
+def montar_tags(info, url=None, album=ALBUM_PADRAO):
+    """Reúne as tags gravadas no áudio a partir do info dict do yt-dlp."""
+    artist, title = extrair_artista_do_titulo(info.get('title') or '')
+    data = info.get('upload_date') or ''
+    return {
+        'title': title,
+        'artist': artist,
+        'album': album,
+        # upload_date vem como AAAAMMDD
+        'date': f"{data[:4]}-{data[4:6]}-{data[6:8]}" if len(data) == 8 else None,
+        'video_id': info.get('id'),
+        'purl': url or info.get('webpage_url'),
+    }
+
+def argumentos_ffmpeg(tags):
+    """Tags como opções -metadata do FFmpeg (o muxer de MP3 grava ID3v2)."""
+    argumentos = []
+    for chave, valor in tags.items():
+        if valor:
+            argumentos += ['-metadata', f"{chave}={valor}"]
+    return argumentos
+
+# Extensões de áudio em que as tags são gravadas
+EXTENSOES_COM_TAGS = (".mp3", ".m4a", ".opus")
+
+def _gravar_id3(caminho, tags, capa):
+    """MP3: quadros ID3v2 (mesmos campos gravados pelo FFmpeg na conversão)."""
+    from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TDRC, TXXX
+    from mutagen.mp3 import MP3
+    audio = MP3(caminho, ID3=ID3)
+    if audio.tags is None:
+        audio.add_tags()
+    quadros = {'title': TIT2, 'artist': TPE1, 'album': TALB, 'date': TDRC}
+    for chave, quadro in quadros.items():
+        if tags.get(chave):
+            audio.tags.add(quadro(encoding=3, text=tags[chave]))
+    for chave in ('video_id', 'purl'):
+        if tags.get(chave):
+            audio.tags.add(TXXX(encoding=3, desc=chave, text=tags[chave]))
+    if capa:
+        audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=capa))
+    # Espaço livre (padding) no cabeçalho para que uma nova gravação não reescreva o áudio
+    audio.save(padding=lambda informacoes: max(informacoes.padding, 4096))
+
+def _gravar_mp4(caminho, tags, capa):
+    """M4A: átomos do iTunes; ID e endereço do vídeo em átomos livres."""
+    from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+    audio = MP4(caminho)
+    if audio.tags is None:
+        audio.add_tags()
+    atomos = {'title': '\xa9nam', 'artist': '\xa9ART', 'album': '\xa9alb', 'date': '\xa9day'}
+    for chave, atomo in atomos.items():
+        if tags.get(chave):
+            audio.tags[atomo] = [tags[chave]]
+    for chave in ('video_id', 'purl'):
+        if tags.get(chave):
+            audio.tags[f'----:com.apple.iTunes:{chave}'] = [MP4FreeForm(tags[chave].encode('utf-8'))]
+    if capa:
+        audio.tags['covr'] = [MP4Cover(capa, imageformat=MP4Cover.FORMAT_JPEG)]
+    audio.save()
+
+def _gravar_opus(caminho, tags, capa):
+    """Opus: comentários Vorbis; a capa vai em METADATA_BLOCK_PICTURE."""
+    import base64
+    from mutagen.flac import Picture
+    from mutagen.oggopus import OggOpus
+    audio = OggOpus(caminho)
+    for chave in ('title', 'artist', 'album', 'date', 'video_id', 'purl'):
+        if tags.get(chave):
+            audio[chave] = [tags[chave]]
+    if capa:
+        imagem = Picture()
+        imagem.type = 3  # Cover (front)
+        imagem.mime = 'image/jpeg'
+        imagem.desc = 'Cover'
+        imagem.data = capa
+        audio['metadata_block_picture'] = [base64.b64encode(imagem.write()).decode('ascii')]
+    audio.save()
 
-def aplicar_metadados(mp3_path, title, artist=None, album=None, thumbnail_data=None):
-    """Aplica metadados a um arquivo MP3."""
+_GRAVADORES = {".mp3": _gravar_id3, ".m4a": _gravar_mp4, ".opus": _gravar_opus}
+
+def aplicar_metadados(caminho_arquivo, title, artist=None, album=None, thumbnail_data=None,
+                      date=None, video_id=None, purl=None):
+    """Aplica metadados a um arquivo de áudio (MP3, M4A ou Opus).
+
+    As tags são gravadas no formato do contêiner, em um único `save()`;
+    tags de outros campos já presentes no arquivo são mantidas.
+    """
+    gravar = _GRAVADORES.get(os.path.splitext(caminho_arquivo)[1].lower())
+    if gravar is None:
+        logger.warning(f"Tags não suportadas para {os.path.basename(caminho_arquivo)}")
+        return False
+    tags = {'title': title, 'artist': artist, 'album': album, 'date': date, 'video_id': video_id, 'purl': purl}
     try:
-        # Inicializar tags ID3
-        audio = MP3(mp3_path, ID3=ID3)
-        
-        # Se não houver tags ID3, criar
-        try:
-            audio.add_tags()
-        except:
-            pass  # Tags já existem
-        
-        # Definir título
-        if title:
-            audio.tags.add(TIT2(encoding=3, text=title))
-        
-        # Definir artista
-        if artist:
-            audio.tags.add(TPE1(encoding=3, text=artist))
-        
-        # Definir álbum
-        if album:
-            audio.tags.add(TALB(encoding=3, text=album))
-        
-        # Adicionar thumbnail como capa
+        capa = None
         if thumbnail_data:
             try:
-                # Processar e otimizar a imagem
-                img = Image.open(io.BytesIO(thumbnail_data))
-                # Redimensionar se for muito grande
-                if max(img.size) > 800:
-                    img.thumbnail((800, 800))
-                
-                # Converter para JPEG
-                thumb_io = io.BytesIO()
-                img.convert('RGB').save(thumb_io, 'JPEG', quality=90)
-                thumb_data = thumb_io.getvalue()
-                
-                # Adicionar capa
-                audio.tags.add(APIC(
-                    encoding=3,  # UTF-8
-                    mime='image/jpeg',
-                    type=3,  # Cover (front)
-                    desc='Cover',
-                    data=thumb_data
-                ))
+                # Processar e otimizar a imagem (capas já processadas passam direto)
+                capa = processar_capa(thumbnail_data, *configuracao_capa())
             except Exception as e:
                 logger.error(f"Erro ao processar thumbnail: {str(e)}")
-        
-        # Salvar alterações
-        audio.save()
-        logger.info(f"Metadados aplicados com sucesso a {os.path.basename(mp3_path)}")
+        gravar(caminho_arquivo, tags, capa)
+        logger.info(f"Metadados aplicados com sucesso a {os.path.basename(caminho_arquivo)}")
         return True
     except Exception as e:
         logger.error(f"Erro ao aplicar metadados: {str(e)}")
         return False
 
+_classe_extracao = None
+
+def criar_extracao_com_tags(ydl, qualidade, obter_tags):
+    """Pós-processador que converte para MP3 já gravando tags e capa.
+
+    Substitui o FFmpegExtractAudio do yt-dlp: a mesma execução do FFmpeg que
+    recodifica o áudio recebe as opções -metadata e a capa como segunda
+    entrada, então o arquivo é escrito uma única vez. `obter_tags()` é chamado
+    só na hora da conversão e retorna (tags, capa em bytes ou None). Se o
+    arquivo não precisar de conversão, `tags_gravadas` continua False e as
+    tags devem ser aplicadas com `aplicar_metadados`.
+    """
+    global _classe_extracao
+    if _classe_extracao is None:
+        from yt_dlp.postprocessor import FFmpegExtractAudioPP
+        from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessorError
+        from yt_dlp.utils import PostProcessingError
+
+        class ExtracaoAudioComTags(FFmpegExtractAudioPP):
+            def __init__(self, downloader, preferredquality, obter_tags):
+                super().__init__(downloader, preferredcodec='mp3', preferredquality=preferredquality)
+                self.obter_tags = obter_tags
+                self.tags_gravadas = False
+
+            def run_ffmpeg(self, path, out_path, codec, more_opts):
+                tags, capa = self.obter_tags()
+                acodec_opts = [] if codec is None else ['-acodec', codec]
+                entradas = [(path, [])]
+                arquivo_capa = None
+                if capa:
+                    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+                        f.write(processar_capa(capa, *configuracao_capa()))
+                        arquivo_capa = f.name
+                    entradas.append((arquivo_capa, []))
+                    opts = ['-map', '0:a', '-map', '1:0', *acodec_opts, *more_opts,
+                            '-c:v', 'copy',
+                            '-metadata:s:v', 'title=Cover', '-metadata:s:v', 'comment=Cover (front)']
+                else:
+                    opts = ['-vn', *acodec_opts, *more_opts]
+                opts += argumentos_ffmpeg(tags)
+                try:
+                    self.real_run_ffmpeg(entradas, [(out_path, opts)])
+                except FFmpegPostProcessorError as err:
+                    raise PostProcessingError(f'audio conversion failed: {err.msg}')
+                finally:
+                    if arquivo_capa:
+                        os.remove(arquivo_capa)
+                self.tags_gravadas = True
+
+        _classe_extracao = ExtracaoAudioComTags
+    return _classe_extracao(ydl, qualidade, obter_tags)
+
 def extrair_artista_do_titulo(title):
     """Tenta extrair o artista do título do vídeo."""
     if ' - ' in title:
@@ -0,0 +1,151 @@
+import http.server
+import json
+import threading
+import time
+from src.utils.helpers import logger
+
+# Limites (segundos) dos buckets do histograma de duração das fases
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+class Metricas:
+    """Registro das fases (spans) de cada tarefa e dos totais do processo.
+
+    Cada fase medida por `TarefaDownload.medir` vira um span com duração e
+    atributos (ex.: bytes). Os spans podem ser gravados como JSON lines em
+    `arquivo` e são somados em contadores e histogramas, exportados no
+    formato de texto do Prometheus por `texto_prometheus()`.
+    """
+
+    def __init__(self, arquivo=None):
+        self._lock = threading.Lock()
+        self._saida = None
+        self._fases = {}  # fase -> {'buckets': [...], 'soma': s, 'contagem': n, 'bytes': b}
+        self._tarefas = {}  # (tipo, estado) -> quantidade
+        self._medidores = {}  # nome -> (ajuda, tipo, função que retorna o valor)
+        self._servidor = None
+        if arquivo:
+            self.gravar_em(arquivo)
+
+    def gravar_em(self, arquivo):
+        """Passa a gravar os spans e as tarefas concluídas como JSON lines."""
+        with self._lock:
+            if self._saida is not None:
+                self._saida.close()
+            self._saida = open(arquivo, "a", encoding="utf-8")
+
+    def _escrever(self, registro):
+        # Chamado com o lock adquirido
+        if self._saida is None:
+            return
+        try:
+            self._saida.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+            self._saida.flush()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Não foi possível gravar métricas: {str(e)}")
+            self._saida = None
+
+    def registrar_span(self, fase, inicio, duracao, id_tarefa=None, **atributos):
+        with self._lock:
+            estado = self._fases.setdefault(fase, {'buckets': [0] * len(BUCKETS), 'soma': 0.0, 'contagem': 0, 'bytes': 0})
+            for i, limite in enumerate(BUCKETS):
+                if duracao <= limite:
+                    estado['buckets'][i] += 1
+            estado['soma'] += duracao
+            estado['contagem'] += 1
+            estado['bytes'] += atributos.get('bytes') or 0
+            self._escrever({'type': 'span', 'job': id_tarefa, 'span': fase, 'start': round(inicio, 6),
+                            'duration': round(duracao, 6), **atributos})
+
+    def registrar_tarefa(self, tarefa, estado):
+        """Conta a tarefa finalizada e grava o resumo com os tempos de cada fase."""
+        with self._lock:
+            chave = (tarefa.tipo, estado)
+            self._tarefas[chave] = self._tarefas.get(chave, 0) + 1
+            self._escrever({'type': 'job', 'job': tarefa.id, 'url': tarefa.url, 'kind': tarefa.tipo,
+                            'state': estado, 'error': tarefa.erro, 'bytes': tarefa.bytes_baixados,
+                            'timings': {fase: round(duracao, 6) for fase, duracao in tarefa.tempos.items()},
+                            'time': round(time.time(), 3)})
+
+    def registrar_medidor(self, nome, ajuda, funcao, tipo="gauge"):
+        """Valor lido a cada exportação, ex.: tamanho de uma fila.
+
+        Use `tipo="counter"` para totais mantidos por outro objeto, como os
+        acertos do cache.
+        """
+        with self._lock:
+            self._medidores[nome] = (ajuda, tipo, funcao)
+
+    def texto_prometheus(self):
+        """Métricas no formato de texto do Prometheus."""
+        linhas = []
+        with self._lock:
+            fases = {fase: dict(estado, buckets=list(estado['buckets'])) for fase, estado in self._fases.items()}
+            tarefas = dict(self._tarefas)
+            medidores = dict(self._medidores)
+
+        linhas.append("# HELP ytdl_phase_seconds Duração das fases das tarefas de download")
+        linhas.append("# TYPE ytdl_phase_seconds histogram")
+        for fase, estado in sorted(fases.items()):
+            for limite, quantidade in zip(BUCKETS, estado['buckets']):
+                linhas.append(f'ytdl_phase_seconds_bucket{{phase="{fase}",le="{limite}"}} {quantidade}')
+            linhas.append(f'ytdl_phase_seconds_bucket{{phase="{fase}",le="+Inf"}} {estado["contagem"]}')
+            linhas.append(f'ytdl_phase_seconds_sum{{phase="{fase}"}} {estado["soma"]:.6f}')
+            linhas.append(f'ytdl_phase_seconds_count{{phase="{fase}"}} {estado["contagem"]}')
+
+        linhas.append("# HELP ytdl_phase_bytes_total Bytes processados por fase")
+        linhas.append("# TYPE ytdl_phase_bytes_total counter")
+        for fase, estado in sorted(fases.items()):
+            if estado['bytes']:
+                linhas.append(f'ytdl_phase_bytes_total{{phase="{fase}"}} {estado["bytes"]}')
+
+        linhas.append("# HELP ytdl_jobs_total Tarefas finalizadas por tipo e estado")
+        linhas.append("# TYPE ytdl_jobs_total counter")
+        for (tipo, estado), quantidade in sorted(tarefas.items()):
+            linhas.append(f'ytdl_jobs_total{{type="{tipo}",state="{estado}"}} {quantidade}')
+
+        for nome, (ajuda, tipo, funcao) in sorted(medidores.items()):
+            try:
+                valor = funcao()
+            except Exception as e:
+                logger.warning(f"Erro ao ler a métrica {nome}: {str(e)}")
+                continue
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            linhas.append(f"{nome} {valor}")
+        return "\n".join(linhas) + "\n"
+
+    def iniciar_servidor(self, porta, host="127.0.0.1"):
+        """Expõe /metrics por HTTP em uma thread de fundo (modo sem interface)."""
+        metricas = self
+
+        class Manipulador(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = metricas.texto_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = http.server.ThreadingHTTPServer((host, porta), Manipulador)
+        threading.Thread(target=self._servidor.serve_forever, name="metricas", daemon=True).start()
+        logger.info(f"Métricas disponíveis em http://{host}:{self._servidor.server_address[1]}/metrics")
+        return self._servidor.server_address[1]
+
+_metricas = None
+_lock_metricas = threading.Lock()
+
+def obter_metricas():
+    """Registro de métricas compartilhado pelo processo."""
+    global _metricas
+    with _lock_metricas:
+        if _metricas is None:
+            from src.config.config import obter_valor_config
+            _metricas = Metricas(obter_valor_config("metrics_file", "") or None)
+        return _metricas
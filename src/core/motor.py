@@ -0,0 +1,108 @@
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+from src.utils.helpers import logger
+from src.config.config import obter_valor_config
+
+# Cache em disco do yt-dlp (código do player e funções de assinatura do
+# YouTube), compartilhado por todas as instâncias e entre execuções
+DIRETORIO_CACHE_YTDLP = os.path.join("cache", "yt-dlp")
+
+def opcoes_ytdlp(opcoes):
+    """Completa as opções de um YoutubeDL com as comuns a todo o programa."""
+    return {'cachedir': DIRETORIO_CACHE_YTDLP, **opcoes}
+
+class PoolYoutubeDL:
+    """Instâncias do YoutubeDL mantidas aquecidas entre tarefas.
+
+    Criar um YoutubeDL reinicia extratores, cookies e conexões HTTP, e o
+    extrator do YouTube perde o player já interpretado. Aqui as instâncias
+    ficam guardadas por perfil (o conjunto de opções) e são emprestadas a uma
+    thread por vez, pois o YoutubeDL não é seguro para uso simultâneo.
+    Se todas estiverem ocupadas, uma nova é criada; na devolução, ficam no
+    máximo `max_ociosas` por perfil.
+    """
+
+    def __init__(self, max_ociosas=4):
+        self.max_ociosas = max_ociosas
+        self._ociosas = {}  # perfil -> instâncias livres
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _perfil(opcoes):
+        return json.dumps(opcoes, sort_keys=True, default=repr)
+
+    @contextmanager
+    def emprestar(self, opcoes):
+        """Empresta uma instância com as opções informadas (não usar com `with YoutubeDL`)."""
+        opcoes = opcoes_ytdlp(opcoes)
+        perfil = self._perfil(opcoes)
+        with self._lock:
+            livres = self._ociosas.get(perfil)
+            ydl = livres.pop() if livres else None
+        if ydl is None:
+            from yt_dlp import YoutubeDL
+            ydl = YoutubeDL(opcoes)
+            logger.debug(f"Nova instância do YoutubeDL para o perfil {perfil}")
+
+        try:
+            yield ydl
+        finally:
+            self._devolver(perfil, ydl)
+
+    @contextmanager
+    def emprestar_download(self, opcoes):
+        """Empresta uma instância que adia o pós-processamento (ver criar_ydl_adiado).
+
+        O perfil vem das opções fixas (cabeçalhos, FFmpeg, fragmentos); as da
+        tarefa (modelo de saída, formato, pós-processadores, ganchos) são
+        aplicadas no empréstimo e removidas na devolução.
+        """
+        from src.core.posprocessamento import OPCOES_TAREFA, criar_ydl_adiado
+        fixas = opcoes_ytdlp({chave: valor for chave, valor in opcoes.items() if chave not in OPCOES_TAREFA})
+        da_tarefa = {chave: opcoes[chave] for chave in OPCOES_TAREFA if chave in opcoes}
+        perfil = "download:" + self._perfil(fixas)
+        with self._lock:
+            livres = self._ociosas.get(perfil)
+            ydl = livres.pop() if livres else None
+        if ydl is None:
+            ydl = criar_ydl_adiado(fixas)
+            logger.debug(f"Nova instância de download do YoutubeDL para o perfil {perfil}")
+
+        try:
+            ydl.preparar(da_tarefa)
+            yield ydl
+        finally:
+            ydl.limpar()
+            self._devolver(perfil, ydl)
+
+    def _devolver(self, perfil, ydl):
+        with self._lock:
+            livres = self._ociosas.setdefault(perfil, [])
+            if len(livres) < self.max_ociosas:
+                livres.append(ydl)
+                return
+        ydl.close()
+
+    def fechar(self):
+        """Fecha todas as instâncias ociosas."""
+        with self._lock:
+            instancias = [ydl for livres in self._ociosas.values() for ydl in livres]
+            self._ociosas.clear()
+        for ydl in instancias:
+            ydl.close()
+
+_pool = None
+_lock_pool = threading.Lock()
+
+def obter_pool():
+    """Pool compartilhado pelo downloader, pela expansão de playlists e pela CLI."""
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = PoolYoutubeDL(obter_valor_config("ytdlp_pool_size", 4))
+            # Fechar as conexões das instâncias ociosas ao sair
+            atexit.register(_pool.fechar)
+        return _pool
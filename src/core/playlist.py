@@ -0,0 +1,50 @@
+from src.utils.helpers import logger, extrair_id_video
+from src.core.motor import obter_pool
+
+def expandir_playlist(url):
+    """Lista os vídeos de uma playlist ou canal sem extrair cada vídeo.
+
+    Usa a extração "flat" do yt-dlp, que lê apenas as páginas da listagem.
+    Retorna (informações da playlist, lista de entradas com id, url e título).
+    """
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'skip_download': True
+    }
+
+    with obter_pool().emprestar(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        entradas = []
+        _coletar_entradas(ydl, info, entradas, set())
+
+    logger.info(f"Playlist '{info.get('title')}' expandida: {len(entradas)} vídeos")
+    return info, entradas
+
+def _coletar_entradas(ydl, info, entradas, vistos):
+    """Percorre as entradas, expandindo abas de canal (Vídeos, Shorts, ...) aninhadas."""
+    for entrada in info.get('entries') or []:
+        if not entrada:
+            continue
+
+        # Canais sem aba específica retornam as abas como sub-playlists
+        if entrada.get('_type') == 'playlist':
+            _coletar_entradas(ydl, entrada, entradas, vistos)
+            continue
+        if entrada.get('ie_key') == 'YoutubeTab':
+            sub_info = ydl.extract_info(entrada['url'], download=False)
+            _coletar_entradas(ydl, sub_info, entradas, vistos)
+            continue
+
+        id_video = entrada.get('id') or extrair_id_video(entrada.get('url', ''))
+        if not id_video or id_video in vistos:
+            continue
+        vistos.add(id_video)
+
+        entradas.append({
+            'id': id_video,
+            'url': f"https://www.youtube.com/watch?v={id_video}",
+            'title': entrada.get('title'),
+            'index': len(entradas) + 1
+        })
@@ -0,0 +1,157 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from src.utils.helpers import logger, definir_tarefa_log
+from src.core.motor import opcoes_ytdlp
+from src.core.metricas import obter_metricas
+
+def workers_padrao():
+    """Metade dos núcleos: o FFmpeg já usa mais de uma thread ao recodificar."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+# Opções que mudam a cada tarefa; as demais definem o perfil da instância no pool
+OPCOES_TAREFA = ('outtmpl', 'format', 'merge_output_format', 'postprocessors', 'progress_hooks', 'overwrites')
+
+_classe_ydl = None
+
+def criar_ydl_adiado(opcoes):
+    """Cria um YoutubeDL que baixa, mas deixa o pós-processamento para depois.
+
+    O yt-dlp chama `post_process` (junção de formatos, correções, extração de
+    áudio, remuxagem e a movimentação do arquivo final) ao fim de cada
+    download. Aqui a chamada só é registrada; `executar_adiados()` a executa
+    mais tarde, na etapa de pós-processamento. `preparar()` troca as opções
+    da tarefa, para que a mesma instância sirva a vários downloads.
+    """
+    global _classe_ydl
+    if _classe_ydl is None:
+        from yt_dlp import YoutubeDL
+
+        class YoutubeDLAdiado(YoutubeDL):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.adiados = []
+
+            def post_process(self, filename, info, files_to_move=None):
+                info['filepath'] = filename
+                # Cópia: o yt-dlp remove chaves do info dict após o download
+                self.adiados.append((filename, dict(info), files_to_move))
+                return info
+
+            def preparar(self, opcoes):
+                """Aplica as opções de uma tarefa (ver OPCOES_TAREFA) a uma instância reaproveitada."""
+                from yt_dlp.postprocessor import get_postprocessor
+                from yt_dlp.utils import POSTPROCESS_WHEN
+                opcoes = dict(opcoes)
+                if 'outtmpl' in opcoes:
+                    # O YoutubeDL guarda o modelo normalizado em um dict
+                    self.params['outtmpl'] = {'default': opcoes.pop('outtmpl')}
+                    self._parse_outtmpl()
+                pos_processadores = opcoes.pop('postprocessors', [])
+                ganchos = opcoes.pop('progress_hooks', [])
+                self.params.update(opcoes)
+                # O seletor de formatos é montado no __init__
+                formato = self.params.get('format')
+                self.format_selector = self.build_format_selector(formato) if formato else None
+                
+                self._pps = {quando: [] for quando in POSTPROCESS_WHEN}
+                for definicao in pos_processadores:
+                    definicao = dict(definicao)
+                    quando = definicao.pop('when', 'post_process')
+                    self.add_post_processor(get_postprocessor(definicao.pop('key'))(self, **definicao), when=quando)
+                self._progress_hooks = list(ganchos)
+                self.adiados = []
+                self._num_downloads = 0
+                self._download_retcode = 0
+
+            def limpar(self):
+                """Solta ganchos, pós-processadores e adiados da última tarefa antes de voltar ao pool."""
+                self.preparar({'postprocessors': [], 'progress_hooks': []})
+
+            def executar_adiados(self):
+                """Executa o pós-processamento registrado; retorna os info dicts finais."""
+                adiados, self.adiados = self.adiados, []
+                return [YoutubeDL.post_process(self, *adiado) for adiado in adiados]
+
+        _classe_ydl = YoutubeDLAdiado
+    return _classe_ydl(opcoes_ytdlp(opcoes))
+
+class EstagioPosProcessamento:
+    """Etapa de pós-processamento separada do download.
+
+    Os trabalhos (normalmente processos do FFmpeg) entram em uma fila e são
+    executados por `workers` threads, de modo que o download do próximo item
+    não espera a recodificação do anterior. Cada trabalho devolve um Future.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = int(workers or 0) or workers_padrao()
+        self._fila = queue.Queue()
+        self._threads = []
+        self._em_execucao = 0
+        self._lock = threading.Lock()
+
+    @property
+    def profundidade(self):
+        """Trabalhos aguardando um worker livre."""
+        return self._fila.qsize()
+
+    def estado(self):
+        with self._lock:
+            return {'workers': self.workers, 'queued': self.profundidade, 'running': self._em_execucao}
+
+    def submeter(self, funcao, tarefa=None):
+        """Enfileira `funcao`; os tempos de espera e de execução vão para `tarefa.tempos`."""
+        futuro = Future()
+        self._fila.put((funcao, tarefa, futuro, time.perf_counter()))
+        self._iniciar_workers()
+        if tarefa is not None:
+            estado = self.estado()
+            logger.info(f"Tarefa {tarefa.id} na fila de pós-processamento "
+                        f"({estado['queued']} aguardando, {estado['running']}/{estado['workers']} em execução)")
+        return futuro
+
+    def executar(self, funcao, tarefa=None):
+        """Submete e espera o resultado (exceções do trabalho são repassadas)."""
+        return self.submeter(funcao, tarefa).result()
+
+    def _iniciar_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                worker = threading.Thread(
+                    target=self._executar_worker,
+                    name=f"pos-processamento-{len(self._threads) + 1}",
+                    daemon=True
+                )
+                self._threads.append(worker)
+                worker.start()
+
+    def _executar_worker(self):
+        while True:
+            funcao, tarefa, futuro, enfileirado = self._fila.get()
+            try:
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                with self._lock:
+                    self._em_execucao += 1
+                definir_tarefa_log(tarefa.id if tarefa is not None else None)
+                try:
+                    if tarefa is None:
+                        futuro.set_result(funcao())
+                    else:
+                        espera = time.perf_counter() - enfileirado
+                        tarefa.tempos['fila_pos_processamento'] = espera
+                        obter_metricas().registrar_span('fila_pos_processamento', time.time() - espera,
+                                                        espera, tarefa.id)
+                        with tarefa.medir('pos_processamento'):
+                            futuro.set_result(funcao())
+                except BaseException as e:
+                    futuro.set_exception(e)
+                finally:
+                    definir_tarefa_log(None)
+                    with self._lock:
+                        self._em_execucao -= 1
+            finally:
+                self._fila.task_done()
@@ -0,0 +1,103 @@
+import threading
+import time
+
+def formatar_bytes(valor):
+    """Formata um tamanho em bytes (ex.: 1.5MiB)."""
+    if valor is None:
+        return "N/A"
+    if valor < 1024:
+        return f"{int(valor)}B"
+    for unidade in ("KiB", "MiB", "GiB"):
+        valor /= 1024
+        if valor < 1024 or unidade == "GiB":
+            return f"{valor:.1f}{unidade}"
+
+def formatar_eta(segundos):
+    """Formata segundos restantes como MM:SS ou HH:MM:SS."""
+    if segundos is None:
+        return "N/A"
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos:02d}:{segundos:02d}"
+
+class AgregadorProgresso:
+    """Agrupa os ganchos de progresso do yt-dlp antes de publicá-los.
+
+    O yt-dlp chama o gancho a cada bloco recebido. Aqui cada chamada só
+    atualiza o estado da tarefa, e cada tarefa é publicada no máximo a cada
+    `intervalo` segundos (uma tarefa rápida não atrasa as lentas). As tarefas
+    cujo intervalo já passou saem juntas, como um `ao_progresso_lote` e um
+    `ao_progresso` por tarefa.
+    """
+
+    def __init__(self, publicador, intervalo=0.25):
+        self.publicador = publicador
+        self.intervalo = intervalo
+        self._estados = {}  # id da tarefa -> último estado
+        self._pendentes = set()
+        self._ultima_publicacao = {}  # id da tarefa -> instante da última publicação
+        self._lock = threading.Lock()
+
+    def registrar(self, d, tarefa):
+        """Atualiza o estado da tarefa a partir dos campos numéricos do gancho."""
+        baixados = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if total:
+            percentual = min(100.0, baixados * 100.0 / total)
+        elif d.get('fragment_count'):
+            # Downloads fragmentados (HLS/DASH) podem não informar o tamanho total
+            percentual = min(100.0, (d.get('fragment_index') or 0) * 100.0 / d['fragment_count'])
+        else:
+            percentual = 0.0
+        if d['status'] == 'finished':
+            percentual = 100.0
+
+        tarefa.progresso = int(percentual)
+        agora = time.monotonic()
+        with self._lock:
+            self._estados[tarefa.id] = {
+                'id_tarefa': tarefa.id,
+                'percent': percentual,
+                'downloaded_bytes': baixados,
+                'total_bytes': total or 0,
+                'speed_bytes': d.get('speed'),
+                'eta_seconds': d.get('eta'),
+                'filename': d.get('filename', 'N/A'),
+                'rate_allocated': tarefa.banda_alocada,
+                'rate_achieved': tarefa.banda_obtida
+            }
+            self._pendentes.add(tarefa.id)
+            # O fim de um arquivo é sempre entregue, sem esperar o intervalo
+            if d['status'] != 'finished' and agora - self._ultima_publicacao.get(tarefa.id, 0.0) < self.intervalo:
+                return
+            lote = self._retirar_pendentes(agora, forcar=(tarefa.id,))
+        self._publicar(lote)
+
+    def descarregar(self, tarefa=None):
+        """Publica imediatamente o que estiver pendente e, se indicado, esquece a tarefa."""
+        with self._lock:
+            lote = self._retirar_pendentes(time.monotonic(), forcar=set(self._pendentes))
+            if tarefa is not None:
+                self._estados.pop(tarefa.id, None)
+                self._ultima_publicacao.pop(tarefa.id, None)
+        self._publicar(lote)
+
+    def _retirar_pendentes(self, agora, forcar=()):
+        """Estados das tarefas cujo intervalo já passou, mais as de `forcar`."""
+        prontas = [id_tarefa for id_tarefa in self._pendentes
+                   if id_tarefa in forcar or agora - self._ultima_publicacao.get(id_tarefa, 0.0) >= self.intervalo]
+        for id_tarefa in prontas:
+            self._pendentes.discard(id_tarefa)
+            self._ultima_publicacao[id_tarefa] = agora
+        return [dict(self._estados[id_tarefa]) for id_tarefa in prontas]
+
+    def _publicar(self, lote):
+        if not lote:
+            return
+        # Textos formatados só aqui, uma vez por publicação e não a cada gancho
+        for estado in lote:
+            estado['speed'] = f"{formatar_bytes(estado['speed_bytes'])}/s" if estado['speed_bytes'] else "N/A"
+            estado['eta'] = formatar_eta(estado['eta_seconds'])
+        self.publicador.publicar('ao_progresso_lote', lote)
+        for estado in lote:
+            self.publicador.publicar('ao_progresso', int(estado['percent']), estado)
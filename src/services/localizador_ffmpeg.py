@@ -0,0 +1,130 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from src.utils.helpers import logger
+
+ARQUIVO_CACHE_FFMPEG = os.path.join("cache", "ffmpeg.json")
+
+class LocalizadorFFmpeg:
+    """Localiza o FFmpeg uma única vez por processo.
+
+    Caminhos, versão e encoders suportados são gravados em disco junto com o
+    mtime e o tamanho do executável; enquanto o binário não mudar, as
+    próximas execuções reaproveitam o resultado sem iniciar nenhum processo.
+    """
+
+    def __init__(self, arquivo_cache=ARQUIVO_CACHE_FFMPEG):
+        self.arquivo_cache = arquivo_cache
+        self._dados = None
+        self._lock = threading.Lock()
+
+    def _candidatos(self, nome):
+        """Caminhos possíveis do executável, na ordem de preferência."""
+        executavel = nome + ".exe" if os.name == "nt" else nome
+        if getattr(sys, 'frozen', False):
+            # FFmpeg empacotado junto do executável compilado
+            base_path = os.path.dirname(sys.executable)
+            yield os.path.join(base_path, '_internal', 'ffmpeg', 'bin', executavel)
+        encontrado = shutil.which(nome)
+        if encontrado:
+            yield encontrado
+
+    def _resolver(self, nome):
+        for caminho in self._candidatos(nome):
+            if os.path.isfile(caminho):
+                return os.path.abspath(caminho)
+        return None
+
+    def localizar(self, forcar=False):
+        """Retorna um dict com ffmpeg, ffprobe, version e encoders, ou None se ausente."""
+        with self._lock:
+            if self._dados is not None and not forcar:
+                return self._dados or None
+
+            caminho = self._resolver("ffmpeg")
+            if not caminho:
+                logger.warning("FFmpeg não encontrado")
+                self._dados = {}
+                return None
+
+            stat = os.stat(caminho)
+            chave = {"ffmpeg": caminho, "mtime": stat.st_mtime, "size": stat.st_size}
+            dados = None if forcar else self._ler_cache(chave)
+            if dados is None:
+                dados = dict(chave, **self._inspecionar(caminho))
+                self._gravar_cache(dados)
+            dados["ffprobe"] = self._resolver("ffprobe")
+            self._dados = dados
+            return dados
+
+    def _inspecionar(self, caminho):
+        """Consulta a versão e os encoders do binário (únicos processos iniciados)."""
+        versao, encoders = None, None  # None = lista de encoders desconhecida
+        try:
+            saida = subprocess.run([caminho, "-version"], capture_output=True, text=True, timeout=15).stdout
+            correspondencia = re.match(r"ffmpeg version (\S+)", saida)
+            versao = correspondencia.group(1) if correspondencia else None
+
+            saida = subprocess.run([caminho, "-hide_banner", "-encoders"],
+                                   capture_output=True, text=True, timeout=15).stdout
+            # Após a legenda, linhas no formato " A....D libmp3lame   descrição"
+            lista = saida.split("------", 1)[-1]
+            encoders = re.findall(r"^\s[VAS][\w.]{5}\s+(\S+)", lista, re.MULTILINE)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Não foi possível consultar o FFmpeg em {caminho}: {str(e)}")
+        logger.info(f"FFmpeg {versao or 'desconhecido'} localizado em {caminho}")
+        return {"version": versao, "encoders": encoders}
+
+    def _ler_cache(self, chave):
+        try:
+            with open(self.arquivo_cache, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if all(dados.get(campo) == valor for campo, valor in chave.items()):
+            return dados
+        return None
+
+    def _gravar_cache(self, dados):
+        try:
+            os.makedirs(os.path.dirname(self.arquivo_cache), exist_ok=True)
+            temporario = f"{self.arquivo_cache}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(dados, f)
+            os.replace(temporario, self.arquivo_cache)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o cache do FFmpeg: {str(e)}")
+
+    @property
+    def disponivel(self):
+        return self.localizar() is not None
+
+    def possui_encoder(self, nome):
+        """Se o FFmpeg tem o encoder; na dúvida (lista não obtida), presume que sim."""
+        dados = self.localizar()
+        if not dados:
+            return False
+        encoders = dados.get("encoders")
+        return encoders is None or nome in encoders
+
+    def opcoes_ytdlp(self):
+        """Opções do YoutubeDL apontando para o FFmpeg localizado."""
+        dados = self.localizar()
+        if not dados:
+            return {}
+        return {'ffmpeg_location': os.path.dirname(dados["ffmpeg"])}
+
+_localizador = None
+_lock_localizador = threading.Lock()
+
+def obter_localizador():
+    """Localizador compartilhado pelo downloader e pela interface."""
+    global _localizador
+    with _lock_localizador:
+        if _localizador is None:
+            _localizador = LocalizadorFFmpeg()
+        return _localizador
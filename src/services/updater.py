@@ -1,13 +1,19 @@
-import requests
+import json
+import os
+import time
 import webbrowser
+from functools import partial
 from PyQt5.QtWidgets import QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QTextEdit
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from packaging import version
 
 
-from src.config.config import get_app_version, get_repo_info
+from src.config.config import get_app_version, get_repo_info, obter_valor_config, atualizar_valor_config
 from src.utils.helpers import logger
 
+# Última resposta da API de releases, com o ETag para requisições condicionais
+ARQUIVO_CACHE_RELEASE = os.path.join("cache", "release.json")
+
 class DialogoAtualizacao(QDialog):
     def __init__(self, release_info, parent=None):
         super().__init__(parent)
@@ -76,26 +82,101 @@ class DialogoAtualizacao(QDialog):
     
     def ignorar_versao(self):
         """Marca esta versão para ser ignorada."""
-        # TODO: Implementar lógica para ignorar versão
+        # A verificação automática deixa de avisar sobre esta versão
+        atualizar_valor_config("ignored_version", self.release_info.get('tag_name'))
         logger.info(f"Versão {self.release_info.get('tag_name')} ignorada pelo usuário")
         self.reject()
 
+class ThreadVerificacaoAtualizacao(QThread):
+    """Executa a consulta de atualização fora da thread da interface."""
+    sinal_resultado = pyqtSignal(bool, dict)
+
+    def __init__(self, updater, forcar=False):
+        super().__init__()
+        self.updater = updater
+        self.forcar = forcar
+
+    def run(self):
+        tem_atualizacao, release_info = self.updater.verificar_atualizacao(forcar=self.forcar)
+        self.sinal_resultado.emit(tem_atualizacao, release_info or {})
+
 class AutoUpdater:
-    def __init__(self, modo_teste=False):
+    def __init__(self, modo_teste=False, url_api=None, arquivo_cache=ARQUIVO_CACHE_RELEASE):
         # Configurações do repositório GitHub
         repo_info = get_repo_info()
         self.repo_owner = repo_info["owner"]
         self.repo_name = repo_info["name"]
         self.debug = True  # Ativar/desativar debug
         self.modo_teste = modo_teste  # Parâmetro para teste
+        # Permite apontar para um servidor local nos testes
+        self.url_api = url_api or f"https://api.github.com/repos/{self.repo_owner}/{self.repo_name}/releases/latest"
+        self.arquivo_cache = arquivo_cache
+        self._threads = set()
         
         # Obtém a versão atual
         self.current_version = get_app_version()
         if self.debug:
             logger.info(f"DEBUG: Versão atual carregada: {self.current_version}")
     
-    def verificar_atualizacao(self):
-        """Verifica se tem atualização disponível."""
+    def _ler_cache(self):
+        try:
+            with open(self.arquivo_cache, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _gravar_cache(self, etag, release_info):
+        try:
+            os.makedirs(os.path.dirname(self.arquivo_cache), exist_ok=True)
+            temporario = f"{self.arquivo_cache}.tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"etag": etag, "release": release_info}, f)
+            os.replace(temporario, self.arquivo_cache)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o cache da release: {e}")
+    
+    def _obter_release(self, forcar=False):
+        """Retorna o JSON da última release, consultando a rede só quando necessário.
+
+        Dentro do intervalo configurado usa a resposta em cache. Fora dele, faz
+        uma requisição condicional (If-None-Match); um 304 também reaproveita o
+        cache e não conta no limite de requisições da API do GitHub.
+        """
+        cache = self._ler_cache()
+        intervalo = obter_valor_config("update_check_interval_hours", 24) * 3600
+        ultima = obter_valor_config("last_update_check", 0)
+        if cache and not forcar and time.time() - ultima < intervalo:
+            if self.debug:
+                logger.info("DEBUG: Verificação recente, usando release em cache")
+            return cache["release"]
+        
+        import requests
+        cabecalhos = {'Accept': 'application/vnd.github+json'}
+        if cache and cache.get("etag"):
+            cabecalhos['If-None-Match'] = cache["etag"]
+        response = requests.get(self.url_api, headers=cabecalhos, timeout=10)
+        
+        if response.status_code == 304 and cache:
+            if self.debug:
+                logger.info("DEBUG: Release não mudou desde a última verificação (304)")
+            release_info = cache["release"]
+        elif response.status_code == 200:
+            release_info = response.json()
+            self._gravar_cache(response.headers.get('ETag'), release_info)
+        else:
+            if self.debug:
+                logger.error(f"DEBUG: Erro HTTP {response.status_code} ao verificar atualizações")
+            return None
+        
+        atualizar_valor_config("last_update_check", time.time())
+        return release_info
+    
+    def verificar_atualizacao(self, forcar=False):
+        """Verifica se tem atualização disponível.
+
+        Com `forcar` (verificação manual), ignora o intervalo entre consultas e
+        também mostra versões que o usuário pediu para ignorar.
+        """
         # Se estiver em modo de teste, simula uma atualização
         if self.modo_teste:
             if self.debug:
@@ -110,13 +191,17 @@ class AutoUpdater:
         # Código para verificação real
         try:
             # Pega informações da última release do GitHub
-            url = f"https://api.github.com/repos/{self.repo_owner}/{self.repo_name}/releases/latest"
-            response = requests.get(url, timeout=10)
+            release_info = self._obter_release(forcar)
             
-            if response.status_code == 200:
-                release_info = response.json()
+            if release_info:
+                release_info = dict(release_info)
                 versao_github = release_info['tag_name']
                 
+                if not forcar and versao_github == obter_valor_config("ignored_version", ""):
+                    if self.debug:
+                        logger.info(f"DEBUG: Versão {versao_github} ignorada pelo usuário")
+                    return False, None
+                
                 # Remove 'v' se existir e limpa espaços
                 versao_nova = versao_github.replace('v', '').strip()
                 versao_atual = self.current_version.strip()
@@ -180,8 +265,6 @@ class AutoUpdater:
                         return True, release_info
                     return False, None
             else:
-                if self.debug:
-                    logger.error(f"DEBUG: Erro HTTP {response.status_code} ao verificar atualizações")
                 return False, None
                 
         except Exception as e:
@@ -195,17 +278,24 @@ class AutoUpdater:
         return dialogo.exec_()
     
     def verificar_e_notificar(self, parent=None, silencioso=True):
-        """Verifica atualizações e notifica o usuário se encontrar."""
-        tem_atualizacao, release_info = self.verificar_atualizacao()
-        
+        """Verifica atualizações em segundo plano e notifica o usuário se encontrar.
+
+        A consulta roda em uma QThread; o resultado volta para a thread da
+        interface, onde o diálogo ou a mensagem são exibidos.
+        """
+        thread = ThreadVerificacaoAtualizacao(self, forcar=not silencioso)
+        thread.sinal_resultado.connect(partial(self._notificar, parent, silencioso))
+        # Manter a referência até o fim, senão a thread é coletada em execução
+        self._threads.add(thread)
+        thread.finished.connect(partial(self._threads.discard, thread))
+        thread.start()
+    
+    def _notificar(self, parent, silencioso, tem_atualizacao, release_info):
         if tem_atualizacao:
             self.mostrar_dialogo_atualizacao(release_info, parent)
-            return True
         elif not silencioso:
             QMessageBox.information(
                 parent,
                 "Verificação de Atualização",
                 "Você já está usando a versão mais recente!"
             )
-        
-        return False
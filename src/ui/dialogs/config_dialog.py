@@ -1,9 +1,9 @@
 from PyQt5.QtWidgets import (QLabel, QPushButton, QVBoxLayout,
                             QHBoxLayout, QComboBox,QRadioButton, 
                             QGroupBox, QCheckBox, QDialog, QGridLayout,
-                            )
+                            QSpinBox)
 
-from src.config.config import carregar_config, salvar_config
+from src.config.config import carregar_config, atualizar_valores_config
 
 class DialogoConfiguracoes(QDialog):
     def __init__(self, parent=None):
@@ -47,6 +47,17 @@ class DialogoConfiguracoes(QDialog):
         self.qualidade_audio.setCurrentIndex(mapa_qualidade.get(self.config["audio_quality"], 2))
         
         layout_audio.addWidget(self.qualidade_audio, 0, 1)
+        
+        layout_audio.addWidget(QLabel("Formato:"), 1, 0)
+        self.formato_audio = QComboBox()
+        # Sem recodificar, o download de áudio é bem mais rápido e sem perda
+        self.formato_audio.addItems(["MP3", "M4A", "Opus", "Original (sem conversão)"])
+        self.formatos_audio = ["mp3", "m4a", "opus", "original"]
+        formato_atual = self.config.get("audio_format", "mp3")
+        self.formato_audio.setCurrentIndex(
+            self.formatos_audio.index(formato_atual) if formato_atual in self.formatos_audio else 0
+        )
+        layout_audio.addWidget(self.formato_audio, 1, 1)
         grupo_audio.setLayout(layout_audio)
         layout.addWidget(grupo_audio)
         
@@ -74,6 +85,27 @@ class DialogoConfiguracoes(QDialog):
         grupo_video.setLayout(layout_video)
         layout.addWidget(grupo_video)
         
+        # Transferência
+        grupo_download = QGroupBox("Download")
+        layout_download = QGridLayout()
+        
+        layout_download.addWidget(QLabel("Fragmentos simultâneos:"), 0, 0)
+        self.fragmentos = QSpinBox()
+        self.fragmentos.setRange(1, 16)
+        self.fragmentos.setValue(int(self.config.get("concurrent_fragments", 4)))
+        self.fragmentos.setToolTip("Partes de vídeos DASH/HLS baixadas ao mesmo tempo")
+        layout_download.addWidget(self.fragmentos, 0, 1)
+        
+        layout_download.addWidget(QLabel("Downloader:"), 1, 0)
+        self.downloader = QComboBox()
+        self.downloader.addItems(["Interno (yt-dlp)", "aria2c"])
+        self.downloader.setCurrentIndex(1 if self.config.get("external_downloader") == "aria2c" else 0)
+        self.downloader.setToolTip("O aria2c precisa estar instalado e no PATH")
+        layout_download.addWidget(self.downloader, 1, 1)
+        
+        grupo_download.setLayout(layout_download)
+        layout.addWidget(grupo_download)
+        
         # Metadados
         grupo_metadados = QGroupBox("Metadados")
         layout_metadados = QVBoxLayout()
@@ -119,19 +151,18 @@ class DialogoConfiguracoes(QDialog):
         mapa_qualidade = {0: "360p", 1: "480p", 2: "720p", 3: "1080p"}
         nova_qualidade_video = mapa_qualidade[self.qualidade_video.currentIndex()]
         
-        # Atualizar configurações
-        self.config["theme"] = novo_tema
-        self.config["audio_quality"] = nova_qualidade_audio
-        self.config["video_format"] = novo_formato_video
-        self.config["video_quality"] = nova_qualidade_video
-        self.config["apply_metadata"] = self.aplicar_metadados.isChecked()
-        self.config["save_thumbnails"] = self.salvar_thumbnails.isChecked()
-        
-        # Salvar
-        salvar_config(self.config)
-        
-        # Aplicar tema
-        if self.parent:
-            self.parent.aplicar_tema(novo_tema)
+        # Salvar só as chaves deste diálogo; a janela principal aplica o tema
+        # ao ser avisada da mudança
+        atualizar_valores_config({
+            "theme": novo_tema,
+            "audio_quality": nova_qualidade_audio,
+            "audio_format": self.formatos_audio[self.formato_audio.currentIndex()],
+            "video_format": novo_formato_video,
+            "video_quality": nova_qualidade_video,
+            "apply_metadata": self.aplicar_metadados.isChecked(),
+            "save_thumbnails": self.salvar_thumbnails.isChecked(),
+            "concurrent_fragments": self.fragmentos.value(),
+            "external_downloader": "aria2c" if self.downloader.currentIndex() == 1 else "",
+        })
         
         self.accept()
\ No newline at end of file
@@ -1,39 +1,48 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QLabel, QLineEdit, QPushButton, 
                             QVBoxLayout, QHBoxLayout, QFileDialog, QProgressBar, 
                             QMessageBox, QComboBox, QTabWidget, QAction)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5 import QtGui
 import os
 import subprocess
 import platform
+import threading
+import time
 
 from src.core.downloader import GerenciadorDownload
-from src.config.config import carregar_config, salvar_config, get_app_version
-from src.utils.helpers import verificar_dependencias, logger, validar_url_youtube, get_resource_path
+from src.core.diario import listar_pendentes, remover_tarefa
+from src.config.config import (carregar_config, atualizar_valor_config, atualizar_valores_config,
+                               inscrever_config, cancelar_inscricao_config, get_app_version)
+from src.utils.helpers import (verificar_dependencias, logger, validar_url_youtube, get_resource_path,
+                               marcar_inicializacao, registrar_inicializacao)
 from src.services.updater import AutoUpdater
 from src.ui.widgets.download_thread import ThreadDownload
+from src.ui.widgets.adaptador_qt import AdaptadorQt
 from src.ui.dialogs.config_dialog import DialogoConfiguracoes
 from src.ui.dialogs.history_dialog import DialogoHistorico
 
 
 class JanelaDownloaderYouTube(QMainWindow):
+    # Resultado da verificação de dependências feita em segundo plano
+    sinal_dependencias = pyqtSignal(list)
+    # Mudanças nas configurações, avisadas pelo serviço de configuração (qualquer thread)
+    sinal_config = pyqtSignal(dict)
+    
     def __init__(self):
         super().__init__()
         
-        # Verificar dependências
-        missing_deps = verificar_dependencias()
-        if missing_deps:
-            QMessageBox.critical(
-                self, 
-                "Dependências Ausentes",
-                f"As seguintes dependências estão faltando:\n{', '.join(missing_deps)}\n\n"
-                "Por favor, instale-as antes de continuar."
-            )
+        # Dependências são verificadas depois que a janela aparece (ver showEvent)
+        self._exibida = False
+        self.sinal_dependencias.connect(self.avisar_dependencias_ausentes)
         
         self.gerenciador_download = GerenciadorDownload()
         self.thread = None
         self.dados_config = carregar_config()
         self.caminho_padrao = self.dados_config.get("default_path", "C:/downloads")
+        self._tema_aplicado = None
+        self.sinal_config.connect(self._config_alterada)
+        self._ouvinte_config = self.sinal_config.emit
+        inscrever_config(self._ouvinte_config)
         
         # Configurar interface - com busca robusta de ícone
         self.carregar_icone_aplicacao()
@@ -92,8 +101,9 @@ class JanelaDownloaderYouTube(QMainWindow):
                 self.setStyleSheet(estilo)
             
             # Salvar preferência
+            self._tema_aplicado = tema
             self.dados_config["theme"] = tema
-            salvar_config(self.dados_config)
+            atualizar_valor_config("theme", tema)
         
         except Exception as e:
             logger.error(f"Erro ao aplicar tema: {str(e)}")
@@ -340,7 +350,7 @@ class JanelaDownloaderYouTube(QMainWindow):
             self.entrada_arquivo.setText(pasta)
             self.caminho_padrao = pasta
             self.dados_config["default_path"] = pasta
-            salvar_config(self.dados_config)
+            atualizar_valor_config("default_path", pasta)
     
     def escolher_pasta_video(self):
         pasta = QFileDialog.getExistingDirectory(self, "Selecione a pasta de destino", self.caminho_padrao)
@@ -348,7 +358,7 @@ class JanelaDownloaderYouTube(QMainWindow):
             self.entrada_arquivo_video.setText(pasta)
             self.caminho_padrao = pasta
             self.dados_config["default_path"] = pasta
-            salvar_config(self.dados_config)
+            atualizar_valor_config("default_path", pasta)
     
     def iniciar_download_audio(self):
         url = self.entrada_url.text().strip()
@@ -363,7 +373,7 @@ class JanelaDownloaderYouTube(QMainWindow):
         
         self.dados_config["default_path"] = caminho
         self.dados_config["audio_quality"] = qualidade
-        salvar_config(self.dados_config)
+        atualizar_valores_config({"default_path": caminho, "audio_quality": qualidade})
         
         self.iniciar_download(url, caminho, True, qualidade)
     
@@ -382,7 +392,8 @@ class JanelaDownloaderYouTube(QMainWindow):
         self.dados_config["default_path"] = caminho
         self.dados_config["video_format"] = formato_video
         self.dados_config["video_quality"] = qualidade_video
-        salvar_config(self.dados_config)
+        atualizar_valores_config({"default_path": caminho, "video_format": formato_video,
+                                  "video_quality": qualidade_video})
         
         self.iniciar_download(url, caminho, False, None, formato_video, qualidade_video)
     
@@ -416,6 +427,7 @@ class JanelaDownloaderYouTube(QMainWindow):
         self.thread.sinal_erro.connect(self.erro_download)
         self.thread.sinal_sucesso.connect(self.sucesso_download)
         self.thread.sinal_info.connect(self.mostrar_info)
+        self.thread.sinal_playlist.connect(self.playlist_concluida)
         
         self.thread.start()
     
@@ -428,13 +440,11 @@ class JanelaDownloaderYouTube(QMainWindow):
         self.barra_progresso.setValue(value)
         
         # Mostrar informações detalhadas
-        texto_status = f"Progresso: {value}% | "
-        if 'speed' in info:
-            texto_status += f"Velocidade: {info['speed']} | "
-        if 'eta' in info:
-            texto_status += f"Tempo restante: {info['eta']}"
-            
-        self.label_status.setText(texto_status)
+        texto_status = f"Progresso: {value}% | Velocidade: {info.get('speed', 'N/A')} | Tempo restante: {info.get('eta', 'N/A')}"
+        if 'item' in info:
+            texto_status = f"Playlist: {info['item']} concluído(s) | {texto_status}"
+        if texto_status != self.label_status.text():
+            self.label_status.setText(texto_status)
     
     def erro_download(self, mensagem_erro):
         QMessageBox.critical(self, "Erro", f"Falha na operação:\n{mensagem_erro}")
@@ -444,9 +454,10 @@ class JanelaDownloaderYouTube(QMainWindow):
         titulo = info.get('title', 'Arquivo')
         tipo_formato = info.get('format', 'desconhecido')
         
+        mensagem = "Este vídeo já havia sido baixado." if info.get('duplicate') else "Download concluído!"
         QMessageBox.information(
             self, "Sucesso", 
-            f"Download concluído!\n\nTítulo: {titulo}\nFormato: {tipo_formato.upper()}\nSalvo em:\n{destino}"
+            f"{mensagem}\n\nTítulo: {titulo}\nFormato: {tipo_formato.upper()}\nSalvo em:\n{destino}"
         )
         
         self.resetar_ui()
@@ -457,6 +468,30 @@ class JanelaDownloaderYouTube(QMainWindow):
         else:
             self.entrada_url_video.clear()
     
+    def playlist_concluida(self, resumo):
+        mensagem = (
+            f"Playlist concluída: {resumo.get('title') or 'sem título'}\n\n"
+            f"Vídeos: {resumo['total']}\n"
+            f"Baixados: {resumo['downloaded']}\n"
+            f"Já existentes: {resumo['skipped']}"
+        )
+        if resumo['cancelled']:
+            mensagem += f"\nCancelados: {resumo['cancelled']}"
+        if resumo['errors']:
+            mensagem += f"\nFalhas: {len(resumo['errors'])}\n\n" + "\n".join(resumo['errors'][:3])
+        mensagem += f"\n\nSalvo em:\n{resumo['destination']}"
+        
+        if resumo['errors']:
+            QMessageBox.warning(self, "Playlist", mensagem)
+        else:
+            QMessageBox.information(self, "Playlist", mensagem)
+        self.resetar_ui()
+        
+        if self.abas.currentIndex() == 0:
+            self.entrada_url.clear()
+        else:
+            self.entrada_url_video.clear()
+    
     def mostrar_info(self, info):
         titulo = info.get('title', 'Vídeo desconhecido')
         self.label_status.setText(f"Preparando download: {titulo}")
@@ -496,7 +531,8 @@ class JanelaDownloaderYouTube(QMainWindow):
         )
     
     def verificar_dependencias(self):
-        missing_deps = verificar_dependencias()
+        # Verificação manual: procurar de novo, caso o FFmpeg tenha sido instalado agora
+        missing_deps = verificar_dependencias(forcar=True)
         if missing_deps:
             QMessageBox.warning(
                 self, 
@@ -522,11 +558,89 @@ class JanelaDownloaderYouTube(QMainWindow):
         except Exception as e:
             logger.error(f"Erro na verificação automática de atualização: {e}")
     
+    def _config_alterada(self, alteracoes):
+        """Mantém a cópia local das configurações e o tema em dia com o config.json."""
+        self.dados_config.update(alteracoes)
+        tema = alteracoes.get("theme")
+        if tema and tema != self._tema_aplicado:
+            self.aplicar_tema(tema)
+    
+    def closeEvent(self, event):
+        cancelar_inscricao_config(self._ouvinte_config)
+        super().closeEvent(event)
+    
     def showEvent(self, event):
         """Evento chamado quando a janela é exibida."""
         super().showEvent(event)
         
+        # showEvent também ocorre ao restaurar a janela; agir só na primeira vez
+        if self._exibida:
+            return
+        self._exibida = True
+        marcar_inicializacao("janela exibida")
+        registrar_inicializacao()
+        
+        # Verificar dependências fora da thread da interface
+        threading.Thread(target=self._verificar_dependencias_em_segundo_plano, daemon=True).start()
+        
         # Verificar atualização automaticamente quando a janela abre
         # Fazer isso em um timer para não bloquear a interface
-        from PyQt5.QtCore import QTimer
-        QTimer.singleShot(2000, self.verificar_atualizacao_automatica)  # 2 segundos após abrir
\ No newline at end of file
+        QTimer.singleShot(2000, self.verificar_atualizacao_automatica)  # 2 segundos após abrir
+        QTimer.singleShot(500, self.oferecer_retomada)
+    
+    def oferecer_retomada(self):
+        """Oferece retomar os downloads interrompidos na última execução."""
+        pendentes = listar_pendentes()
+        if not pendentes:
+            return
+        
+        resposta = QMessageBox.question(
+            self,
+            "Downloads Interrompidos",
+            f"{len(pendentes)} download(s) foram interrompidos ou cancelados antes de terminar.\n"
+            "Deseja retomá-los de onde pararam? (Não = descartá-los)"
+        )
+        if resposta != QMessageBox.Yes:
+            for registro in pendentes:
+                remover_tarefa(registro['id'])
+            return
+        
+        # Os downloads retomados rodam na fila, independentes do botão de download
+        self.adaptador_retomada = AdaptadorQt()
+        self.adaptador_retomada.sinal_sucesso.connect(self.retomada_concluida)
+        self.adaptador_retomada.sinal_erro.connect(self.retomada_falhou)
+        self.gerenciador_download.adicionar_ouvinte(self.adaptador_retomada)
+        self.tarefas_retomadas = {t.id for t in self.gerenciador_download.retomar_pendentes()}
+        self.label_status.setText(f"Retomando {len(self.tarefas_retomadas)} download(s) interrompido(s)...")
+    
+    def retomada_concluida(self, caminho, info):
+        if info.get('id_tarefa') not in self.tarefas_retomadas:
+            return
+        self._finalizar_retomada(info['id_tarefa'], f"Download retomado concluído: {info.get('title')}")
+    
+    def retomada_falhou(self, mensagem, id_tarefa):
+        if id_tarefa not in self.tarefas_retomadas:
+            return
+        self._finalizar_retomada(id_tarefa, f"Falha ao retomar download: {mensagem}")
+    
+    def _finalizar_retomada(self, id_tarefa, texto):
+        self.tarefas_retomadas.discard(id_tarefa)
+        self.label_status.setText(f"{texto} ({len(self.tarefas_retomadas)} restante(s))")
+        if not self.tarefas_retomadas:
+            self.gerenciador_download.remover_ouvinte(self.adaptador_retomada)
+    
+    def _verificar_dependencias_em_segundo_plano(self):
+        inicio = time.perf_counter()
+        missing_deps = verificar_dependencias()
+        logger.info(f"Dependências verificadas em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        # O sinal entrega o resultado na thread da interface
+        self.sinal_dependencias.emit(missing_deps)
+    
+    def avisar_dependencias_ausentes(self, missing_deps):
+        if missing_deps:
+            QMessageBox.critical(
+                self, 
+                "Dependências Ausentes",
+                f"As seguintes dependências estão faltando:\n{', '.join(missing_deps)}\n\n"
+                "Por favor, instale-as antes de continuar."
+            )
\ No newline at end of file
@@ -0,0 +1,38 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from src.core.eventos import OuvinteDownload
+
+class AdaptadorQt(QObject, OuvinteDownload):
+    """Converte os eventos do motor de download em sinais Qt.
+
+    Os eventos chegam na thread de download; como o adaptador vive na thread
+    da interface, o Qt entrega os sinais aos slots na thread correta.
+    Com `ids`, só os eventos dessas tarefas são repassados (o gerenciador é
+    compartilhado entre o download manual e os retomados); erros sem tarefa,
+    como os de validação, passam sempre.
+    """
+    sinal_progresso = pyqtSignal(int, dict)
+    sinal_erro = pyqtSignal(str, object)
+    sinal_sucesso = pyqtSignal(str, dict)
+    sinal_info = pyqtSignal(dict)
+
+    def __init__(self, ids=None):
+        super().__init__()
+        self.ids = set(ids) if ids is not None else None
+
+    def _aceita(self, id_tarefa):
+        return self.ids is None or id_tarefa is None or id_tarefa in self.ids
+
+    def ao_info(self, info):
+        self.sinal_info.emit(info)
+
+    def ao_progresso(self, progresso, info):
+        if self._aceita(info.get('id_tarefa')):
+            self.sinal_progresso.emit(progresso, info)
+
+    def ao_sucesso(self, caminho, info):
+        if self._aceita(info.get('id_tarefa')):
+            self.sinal_sucesso.emit(caminho, info)
+
+    def ao_erro(self, mensagem, id_tarefa=None):
+        if self._aceita(id_tarefa):
+            self.sinal_erro.emit(mensagem, id_tarefa)
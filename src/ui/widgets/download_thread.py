@@ -1,35 +1,124 @@
+import os
 from PyQt5.QtCore import QThread, pyqtSignal
+from src.core.eventos import OuvinteCallbacks
+from src.core.fila import ESTADO_CANCELADO
+from src.utils.helpers import eh_url_playlist
+from src.ui.widgets.adaptador_qt import AdaptadorQt
 
 class ThreadDownload(QThread):
+    """Envia o download para a fila do gerenciador e espera o resultado.
+
+    A fila aplica o limite de downloads simultâneos e a etapa separada do
+    FFmpeg; sucesso ou falha são lidos da própria tarefa ao final. URLs de
+    playlist ou canal viram uma tarefa por vídeo (os já baixados são
+    pulados), e o progresso publicado passa a ser o da playlist inteira.
+    """
     sinal_progresso = pyqtSignal(int, dict)
     sinal_erro = pyqtSignal(str)
     sinal_sucesso = pyqtSignal(str, dict)
     sinal_info = pyqtSignal(dict)
+    sinal_playlist = pyqtSignal(dict)  # Resumo ao fim de uma playlist
 
     def __init__(self, gerenciador_download, url, caminho, is_audio=True, quality="320", video_format="mp4", video_quality="720p"):
         super().__init__()
         self.gerenciador_download = gerenciador_download
         self.url = url
         self.caminho = caminho
-        self.is_audio = is_audio
-        self.audio_quality = quality
-        self.video_format = video_format
-        self.video_quality = video_quality
+        if is_audio:
+            self.tipo, self.opcoes = "audio", {"quality": quality}
+        else:
+            self.tipo, self.opcoes = "video", {"format": video_format, "quality": video_quality}
+        self.tarefas = []
+        self._cancelado = False
+        self._percentuais = {}  # id da tarefa -> último progresso
         
-        # Conectar sinais do gerenciador
-        self.gerenciador_download.sinal_progresso.connect(self.sinal_progresso)
-        self.gerenciador_download.sinal_erro.connect(self.sinal_erro)
-        self.gerenciador_download.sinal_sucesso.connect(self.sinal_sucesso)
-        self.gerenciador_download.sinal_info.connect(self.sinal_info)
+        # Adaptador criado na thread da interface; só repassa os eventos das
+        # tarefas desta thread (o gerenciador também roda os downloads retomados)
+        self.adaptador = AdaptadorQt(ids=set())
+        self.adaptador.sinal_progresso.connect(self._repassar_progresso)
+        self.adaptador.sinal_erro.connect(self._repassar_erro)
+        self.adaptador.sinal_info.connect(self.sinal_info)
+
+    def _repassar_progresso(self, valor, info):
+        tarefas = list(self.tarefas)
+        if len(tarefas) <= 1:
+            self.sinal_progresso.emit(valor, info)
+            return
+        self._percentuais[info.get('id_tarefa')] = valor
+        concluidas = sum(1 for tarefa in tarefas if tarefa.finalizada)
+        total = sum(100 if tarefa.finalizada else self._percentuais.get(tarefa.id, 0) for tarefa in tarefas)
+        self.sinal_progresso.emit(total // len(tarefas), dict(info, item=f"{concluidas}/{len(tarefas)}"))
+
+    def _repassar_erro(self, mensagem, id_tarefa):
+        # Erros das tarefas são lidos da tarefa ao final; aqui só os gerais
+        if id_tarefa is None:
+            self.sinal_erro.emit(mensagem)
+
+    def _adicionar(self, tarefas):
+        self.adaptador.ids.update(tarefa.id for tarefa in tarefas)
+        self.tarefas.extend(tarefas)
+        if self._cancelado:
+            self.cancelar()
 
     def run(self):
+        self.gerenciador_download.adicionar_ouvinte(self.adaptador)
         try:
-            if self.is_audio:
-                self.gerenciador_download.baixar_audio(self.url, self.caminho, self.audio_quality)
-            else:
-                self.gerenciador_download.baixar_video(self.url, self.caminho, self.video_format, self.video_quality)
+            if eh_url_playlist(self.url):
+                self._baixar_playlist()
+                return
+            tarefa = self.gerenciador_download.enfileirar(self.url, self.caminho, self.tipo, **self.opcoes)
+            self._adicionar([tarefa])
+            tarefa.concluida.wait()
+            self._emitir_resultado(tarefa)
         except Exception as e:
             self.sinal_erro.emit(str(e))
+        finally:
+            self.gerenciador_download.remover_ouvinte(self.adaptador)
+
+    def _baixar_playlist(self):
+        playlist, erros_gerais = {}, []
+        
+        def ao_info(info):
+            if info.get('_type') == 'playlist':
+                playlist.update(info)
+        
+        def ao_erro(mensagem, id_tarefa):
+            if id_tarefa is None:
+                erros_gerais.append(mensagem)
+        
+        # A expansão publica na thread atual; o coletor só existe durante ela
+        coletor = OuvinteCallbacks(ao_info=ao_info, ao_erro=ao_erro)
+        self.gerenciador_download.adicionar_ouvinte(coletor)
+        try:
+            tarefas = self.gerenciador_download.enfileirar_playlist(self.url, self.caminho, self.tipo, **self.opcoes)
+        finally:
+            self.gerenciador_download.remover_ouvinte(coletor)
+        if erros_gerais and not tarefas:
+            return  # O erro já chegou à interface pelo adaptador
+        
+        self._adicionar(tarefas)
+        for tarefa in tarefas:
+            tarefa.concluida.wait()
+        
+        resultados = [tarefa.resultado for tarefa in tarefas if tarefa.resultado is not None]
+        self.sinal_playlist.emit({
+            'title': playlist.get('title'),
+            'destination': self.caminho,
+            'total': playlist.get('playlist_count', len(tarefas)),
+            'skipped': playlist.get('skipped', 0) + sum(1 for r in resultados if r.get('duplicate')),
+            'downloaded': sum(1 for r in resultados if not r.get('duplicate')),
+            'cancelled': sum(1 for tarefa in tarefas if tarefa.estado == ESTADO_CANCELADO),
+            'errors': [tarefa.erro for tarefa in tarefas if tarefa.erro and tarefa.estado != ESTADO_CANCELADO],
+        })
+
+    def _emitir_resultado(self, tarefa):
+        if tarefa.resultado is not None:
+            destino = os.path.dirname(tarefa.resultado.get('path') or "") or tarefa.caminho
+            self.sinal_sucesso.emit(destino, tarefa.resultado)
+        else:
+            self.sinal_erro.emit(tarefa.erro or "Download cancelado pelo usuário")
     
     def cancelar(self):
-        self.gerenciador_download.cancelar_download()
\ No newline at end of file
+        self._cancelado = True
+        for tarefa in list(self.tarefas):
+            self.gerenciador_download.fila.cancelar(tarefa.id)
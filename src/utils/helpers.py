@@ -1,69 +1,173 @@
 import re
+import json
+import atexit
 import logging
-import subprocess
+import logging.handlers
+import queue
+import threading
 from pathlib import Path
 import urllib.parse
 import os
 import sys
+import time
 
-def configurar_logging():
-    """Configura o sistema de logging para diagnóstico do aplicativo."""
+# Referência para o relatório de tempos da inicialização
+_inicio_processo = time.perf_counter()
+_fases_inicializacao = []
+
+FORMATO_LOG = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Os registros entram em uma fila e uma thread de fundo faz a escrita, para
+# que o log não faça E/S de disco na thread que está baixando
+_fila_log = queue.Queue(-1)
+_ouvinte_log = None
+_lock_log = threading.Lock()
+_contexto_log = threading.local()
+
+def definir_tarefa_log(id_tarefa):
+    """Associa os próximos registros desta thread a uma tarefa (None para limpar)."""
+    _contexto_log.id_tarefa = id_tarefa
+
+class _FiltroTarefa(logging.Filter):
+    """Anota o ID da tarefa da thread que emitiu o registro."""
+
+    def filter(self, record):
+        record.id_tarefa = getattr(_contexto_log, 'id_tarefa', None)
+        return True
+
+class FormatadorJSON(logging.Formatter):
+    """Um objeto JSON por linha, com o ID da tarefa quando houver."""
+
+    def format(self, record):
+        dados = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'id_tarefa', None):
+            dados['job'] = record.id_tarefa
+        return json.dumps(dados, ensure_ascii=False)
+
+def _diretorio_logs(config):
+    if config.get("log_dir"):
+        return Path(config["log_dir"])
     # Determinar o diretório base (funciona tanto para script quanto para executável)
     if getattr(sys, 'frozen', False):
         # Executável compilado
-        base_dir = Path(sys.executable).parent
+        return Path(sys.executable).parent / 'logs'
+    # Script Python
+    return Path(__file__).parent / 'logs'
+
+def _criar_handler_arquivo(config, log_dir):
+    log_dir.mkdir(exist_ok=True, parents=True)
+    log_file = log_dir / 'youtube_downloader.log'
+    if config.get("log_rotation", "size") == "daily":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when="midnight", backupCount=config.get("log_backups", 5), encoding="utf-8"
+        )
     else:
-        # Script Python
-        base_dir = Path(__file__).parent
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=int(config.get("log_max_mb", 5) * 1024 * 1024),
+            backupCount=config.get("log_backups", 5), encoding="utf-8"
+        )
+    return handler, log_file
+
+def configurar_logging(config=None):
+    """Configura o sistema de logging para diagnóstico do aplicativo.
+
+    Sem `config` (ao importar este módulo) os registros vão só para o console.
+    Os pontos de entrada chamam de novo com o config.json carregado, o que
+    acrescenta o arquivo com rotação (por tamanho ou diária), o nível e, se
+    pedido, o formato JSON.
+    """
+    global _ouvinte_log
+    config = config or {}
+    nivel = getattr(logging, str(config.get("log_level", "INFO")).upper(), logging.INFO)
     
-    log_dir = base_dir / 'logs'
+    handlers = [logging.StreamHandler()]
+    handlers[0].setFormatter(logging.Formatter(FORMATO_LOG))
     
-    # Tentar criar o diretório de logs com tratamento de erro
-    try:
-        log_dir.mkdir(exist_ok=True, parents=True)
-        log_file = log_dir / 'youtube_downloader.log'
-        file_handler = logging.FileHandler(log_file)
-    except (OSError, PermissionError) as e:
-        # Fallback: usar diretório temporário do usuário
-        import tempfile
-        temp_dir = Path(tempfile.gettempdir()) / 'youtube_downloader_logs'
+    log_file = None
+    if config:
+        # Tentar criar o arquivo de log com tratamento de erro
         try:
-            temp_dir.mkdir(exist_ok=True, parents=True)
-            log_file = temp_dir / 'youtube_downloader.log'
-            file_handler = logging.FileHandler(log_file)
+            file_handler, log_file = _criar_handler_arquivo(config, _diretorio_logs(config))
         except (OSError, PermissionError):
-            # Último recurso: apenas console
-            file_handler = None
+            # Fallback: usar diretório temporário do usuário
+            import tempfile
+            try:
+                file_handler, log_file = _criar_handler_arquivo(
+                    config, Path(tempfile.gettempdir()) / 'youtube_downloader_logs'
+                )
+            except (OSError, PermissionError):
+                # Último recurso: apenas console
+                file_handler = None
+        if file_handler:
+            file_handler.setFormatter(FormatadorJSON() if config.get("log_json") else logging.Formatter(FORMATO_LOG))
+            handlers.append(file_handler)
     
-    # Configurar handlers
-    handlers = [logging.StreamHandler()]
-    if file_handler:
-        handlers.append(file_handler)
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=handlers
-    )
+    with _lock_log:
+        if _ouvinte_log is not None:
+            # Esvazia a fila nos handlers antigos antes de trocá-los
+            _ouvinte_log.stop()
+            for handler in _ouvinte_log.handlers:
+                handler.close()
+        
+        raiz = logging.getLogger()
+        if not any(isinstance(h, logging.handlers.QueueHandler) for h in raiz.handlers):
+            handler_fila = logging.handlers.QueueHandler(_fila_log)
+            handler_fila.addFilter(_FiltroTarefa())
+            raiz.addHandler(handler_fila)
+        raiz.setLevel(nivel)
+        
+        _ouvinte_log = logging.handlers.QueueListener(_fila_log, *handlers, respect_handler_level=True)
+        _ouvinte_log.start()
     
     logger = logging.getLogger('youtube_downloader')
-    if file_handler:
+    if log_file:
         logger.info(f"Log sendo salvo em: {log_file}")
-    else:
+    elif config:
         logger.warning("Não foi possível criar arquivo de log. Usando apenas console.")
     
     return logger
 
+def encerrar_logging():
+    """Grava o que ainda estiver na fila de log (chamado na saída do programa)."""
+    global _ouvinte_log
+    with _lock_log:
+        if _ouvinte_log is not None:
+            _ouvinte_log.stop()
+            _ouvinte_log = None
+
 logger = configurar_logging()
+atexit.register(encerrar_logging)
+
+def marcar_inicializacao(fase):
+    """Registra o fim de uma fase da inicialização do aplicativo."""
+    _fases_inicializacao.append((fase, time.perf_counter()))
+
+def registrar_inicializacao():
+    """Escreve no log a duração de cada fase registrada e o tempo total."""
+    anterior = _inicio_processo
+    partes = []
+    for fase, instante in _fases_inicializacao:
+        partes.append(f"{fase}: {(instante - anterior) * 1000:.0f} ms")
+        anterior = instante
+    logger.info(f"Inicialização em {(anterior - _inicio_processo) * 1000:.0f} ms ({'; '.join(partes)})")
+
+def verificar_dependencias(forcar=False):
+    """Verifica se todas as dependências necessárias estão instaladas.
 
-def verificar_dependencias():
-    """Verifica se todas as dependências necessárias estão instaladas."""
+    O FFmpeg vem do localizador compartilhado; `forcar` refaz a busca.
+    """
+    # Importado aqui: o localizador depende do logger deste módulo
+    from src.services.localizador_ffmpeg import obter_localizador
     missing_deps = []
     
     # Verificar FFmpeg
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-    except (subprocess.SubprocessError, FileNotFoundError):
+    if obter_localizador().localizar(forcar=forcar) is None:
         missing_deps.append("FFmpeg")
     
     # Verificar yt-dlp
@@ -95,7 +199,7 @@ def validar_url_youtube(url):
         return False, "URL mal formatada"
     
     # Verificar se é uma URL do YouTube
-    youtube_regex = r'^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube(-nocookie)?\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)([\w\-]+)(\S+)?$'
+    youtube_regex = r'^((?:https?:)?\/\/)?((?:www|m)\.)?((?:youtube(-nocookie)?\.com|youtu.be))(\/(?:[\w\-]+\?v=|embed\/|v\/)?)(@?[\w\-\.]+)(\S+)?$'
     match = re.match(youtube_regex, url)
     
     if not match:
@@ -103,6 +207,44 @@ def validar_url_youtube(url):
     
     return True, url
 
+def extrair_id_video(url):
+    """Extrai o ID canônico (11 caracteres) de qualquer forma de URL de vídeo do YouTube.
+
+    Reconhece watch?v=, youtu.be/, m.youtube, music.youtube, youtube-nocookie,
+    /embed/, /v/, /shorts/ e /live/. Retorna None para outras URLs.
+    """
+    if not url:
+        return None
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        parsed_url = urllib.parse.urlparse(url)
+    except Exception:
+        return None
+
+    host = parsed_url.netloc.lower().split(":")[0]
+    partes = [parte for parte in parsed_url.path.split("/") if parte]
+    candidato = None
+    if host == "youtu.be":
+        candidato = partes[0] if partes else None
+    elif re.search(r'(^|\.)youtube(-nocookie)?\.com$', host):
+        parametro_v = urllib.parse.parse_qs(parsed_url.query).get("v")
+        if parametro_v:
+            candidato = parametro_v[0]
+        elif len(partes) >= 2 and partes[0] in ("embed", "v", "e", "shorts", "live"):
+            candidato = partes[1]
+
+    if candidato and re.fullmatch(r'[\w\-]{11}', candidato):
+        return candidato
+    return None
+
+def eh_url_playlist(url):
+    """Indica se a URL aponta para uma playlist ou canal em vez de um único vídeo."""
+    if "://" not in url:
+        url = "https://" + url
+    caminho = urllib.parse.urlparse(url).path
+    return caminho == "/playlist" or caminho.startswith(("/@", "/channel/", "/c/", "/user/"))
+
 def sanitizar_nome_arquivo(filename):
     """Remove caracteres inválidos de nomes de arquivos."""
     invalid_chars = r'[<>:"/\\|?*]'